@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
@@ -28,10 +29,12 @@ class RegisterSerializer(serializers.Serializer):
         return attrs
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password']
+        # RegisterApiView hashes the password in the hashing pool and saves with its `password_hash`:
+        password_hash = validated_data.get('password_hash') or make_password(validated_data['password'])
+        user = User.objects.create(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email']),
+            password=password_hash
         )
         return user
 
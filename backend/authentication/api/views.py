@@ -1,22 +1,30 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.contrib.auth import authenticate
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication import hashing
+from core.views import AsyncAPIView
 from .serializers import RegisterSerializer, LoginSerializer
 
 
 User = get_user_model()
 
 
-class RegisterApiView(generics.CreateAPIView):
+class RegisterApiView(AsyncAPIView, generics.CreateAPIView):
+    """
+    API view to register a user and return its JWT pair.
+    the password is hashed in the bounded hashing pool, a full pool answers 503 with Retry-After.
+    """
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
 
-    def create(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        password_hash = await hashing.make_password(serializer.validated_data['password'])
+        user = await sync_to_async(serializer.save)(password_hash=password_hash)
         refresh = RefreshToken.for_user(user)
         return Response({
             'user': RegisterSerializer(user).data,
@@ -25,20 +33,22 @@ class RegisterApiView(generics.CreateAPIView):
         })
 
 
-class LoginApiView(generics.GenericAPIView):
+class LoginApiView(AsyncAPIView, generics.GenericAPIView):
+    """
+    API view to obtain a JWT pair with username and password.
+    the password is checked in the bounded hashing pool, a full pool answers 503 with Retry-After.
+    """
     serializer_class = LoginSerializer
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = authenticate(
-            username=serializer.validated_data['username'],
-            password=serializer.validated_data['password']
-        )
-        if user is not None:
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            })
-        return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+        # the authentication backends run in the pool, ModelBackend hashes for unknown usernames as well:
+        user = await hashing.authenticate(request._request, **serializer.validated_data)
+        if user is None:
+            return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+        refresh = RefreshToken.for_user(user)
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        })
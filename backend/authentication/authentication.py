@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core import routers
+from core.metrics import timed
+
+
+USER_CACHE_KEY = 'auth:user:{pk}'
+# fields permission checks and views read from request.user, the others are loaded on access:
+USER_CACHED_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY.format(pk=user_id)
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached user now and after commit, the next request of the user reloads it from the database.
+    """
+    cache.delete(user_cache_key(user_id))
+    transaction.on_commit(lambda: cache.delete(user_cache_key(user_id)))
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """
+    simplejwt authentication resolving the token user from a short lived cache instead of a query per request.
+    the cached user only has USER_CACHED_FIELDS loaded, deleted or deactivated users are rejected as soon as
+    their cache entry is invalidated by the user signals, or after JWT_USER_CACHE_TIMEOUT at worst.
+    the time spent decoding the token and loading its user is recorded as `auth`.
+    """
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        # before the user lookup, which goes to the primary as well if the user just wrote:
+        routers.user_authenticated(user_id)
+        if api_settings.CHECK_REVOKE_TOKEN:  # needs the password hash, which is not cached
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        fields = cache.get(key)
+        if fields is None:
+            fields = self.user_model.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values(*self.cached_fields()).first()
+            if fields is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(key, fields, timeout=settings.JWT_USER_CACHE_TIMEOUT)
+
+        if not fields['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, list(fields), list(fields.values()))
+
+    def cached_fields(self):
+        # Model.from_db expects the loaded fields in the model field order:
+        return [field.attname for field in self.user_model._meta.concrete_fields
+                if field.attname in USER_CACHED_FIELDS]
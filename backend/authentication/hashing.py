@@ -0,0 +1,94 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import hashers
+from django.db import connection
+from prometheus_client import Counter, Gauge
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.metrics import timed
+
+
+QUEUE_DEPTH = Gauge(
+    'password_hashing_queue_depth', 'Password hashing jobs running or waiting in the hashing pool',
+    multiprocess_mode='livesum'
+)
+REJECTED = Counter('password_hashing_rejected', 'Password hashing jobs rejected because the pool was full')
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+
+
+class HashingPoolFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many authentication requests, try again shortly."
+    default_code = 'hashing_pool_full'
+    # sent as Retry-After by the DRF exception handler:
+    wait = 1
+
+
+def get_executor():
+    """
+    Dedicated pool of the password hashers, PBKDF2 releases the GIL so threads hash in parallel.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix='password-hasher'
+            )
+    return _executor
+
+
+def submit(func, *args):
+    """
+    Queue `func` in the hashing pool, raises HashingPoolFull once PASSWORD_HASHING_MAX_PENDING jobs are pending
+    so auth bursts are turned away instead of piling up behind the hashers.
+    """
+    global _pending
+    with _lock:
+        if _pending >= settings.PASSWORD_HASHING_MAX_PENDING:
+            REJECTED.inc()
+            raise HashingPoolFull()
+        _pending += 1
+    QUEUE_DEPTH.inc()
+    # the request context goes along, the queries of the job count in its timings:
+    future = get_executor().submit(contextvars.copy_context().run, _run_job, func, *args)
+    future.add_done_callback(_job_done)
+    return future
+
+
+def _run_job(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # authenticate reads the user and saves upgraded hashes, the pool threads own their db connection:
+        connection.close()
+
+
+def _job_done(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+    QUEUE_DEPTH.dec()
+
+
+async def run(func, *args):
+    with timed('hashing'):
+        return await asyncio.wrap_future(submit(func, *args))
+
+
+async def make_password(password):
+    return await run(hashers.make_password, password)
+
+
+async def authenticate(request, username, password):
+    return await run(functools.partial(auth.authenticate, request, username=username, password=password))
@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.authentication import JWTAuthentication
+from product.models import Product
+
+
+class CachedJWTAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='test_user', email='u@example.com',
+                                                         password='test1234')
+        self.token = str(AccessToken.for_user(self.user))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return JWTAuthentication().authenticate(request)
+
+    def user_queries(self, queries):
+        return [q['sql'] for q in queries.captured_queries if 'auth_user' in q['sql']]
+
+    def test_user_is_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.authenticate()
+        self.assertEqual(len(self.user_queries(queries)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = self.authenticate()
+        self.assertEqual(self.user_queries(queries), [])
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.username, 'test_user')
+        self.assertFalse(user.is_staff)
+
+    def test_not_cached_fields_are_loaded_on_access(self):
+        self.authenticate()
+        user, _ = self.authenticate()
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'u@example.com')
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/products/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/v1/products/').status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/products/').status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/v1/products/').status_code, 401)
+
+    def test_staff_change_is_seen(self):
+        other = get_user_model().objects.create_user(username='other', password='test1234')
+        product = Product.objects.create(title='p_1', price=1000, description='desc', owner=other)
+        self.assertEqual(self.client.delete(f'/api/v1/products/{product.id}').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.delete(f'/api/v1/products/{product.id}').status_code, 204)
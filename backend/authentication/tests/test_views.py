@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from authentication import hashing
+from authentication.api.serializers import RegisterSerializer
+
+
+class AuthApiViewTest(TransactionTestCase):
+    """
+    the credentials are checked in the hashing pool threads, which only see committed users.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='test_user', password='test1234')
+
+    def login(self, password):
+        return self.client.post('/api/v1/auth/login', {'username': 'test_user', 'password': password}, format='json')
+
+    def test_register(self):
+        response = self.client.post('/api/v1/auth/register', {
+            'username': 'new_user', 'email': 'New@EXAMPLE.com', 'password': 'pass1234', 'repeat_password': 'pass1234',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user'], {'username': 'new_user', 'email': 'New@example.com'})
+        self.assertIn('access', response.data)
+        user = get_user_model().objects.get(username='new_user')
+        self.assertTrue(user.check_password('pass1234'))
+
+    def test_register_serializer_never_saves_raw_password(self):
+        serializer = RegisterSerializer(data={
+            'username': 'new_user', 'email': 'u@example.com', 'password': 'pass1234', 'repeat_password': 'pass1234',
+        })
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        self.assertNotEqual(user.password, 'pass1234')
+        self.assertTrue(user.check_password('pass1234'))
+
+    def test_register_validation(self):
+        response = self.client.post('/api/v1/auth/register', {
+            'username': 'test_user', 'email': 'u@example.com', 'password': 'pass1234', 'repeat_password': 'other123',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.data)
+
+    def test_login(self):
+        response = self.login('test1234')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh', response.data)
+        self.assertIn('hashing', response['Server-Timing'])
+        # the user is read by authenticate in the hashing pool:
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_invalid_credentials(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        response = self.client.post('/api/v1/auth/login', {'username': 'nobody', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login('test1234').status_code, 401)
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0)
+    def test_full_hashing_pool_answers_503(self):
+        rejected = hashing.REJECTED._value.get()
+        response = self.login('test1234')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(hashing.REJECTED._value.get(), rejected + 1)
+        self.assertEqual(hashing.QUEUE_DEPTH._value.get(), 0)
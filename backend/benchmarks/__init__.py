@@ -0,0 +1,49 @@
+"""
+Performance benchmarks of the shop backend.
+
+run them from the backend directory, e.g. `python -m benchmarks.bulk_create`.
+every benchmark runs against a throwaway test database created next to the configured one.
+"""
+import contextlib
+import os
+import statistics
+import time
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=1):
+    """
+    Call `func` `repeat` times and return the duration of each call in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def percentile(durations, percent):
+    if len(durations) == 1:
+        return durations[0]
+    return statistics.quantiles(durations, n=100, method='inclusive')[percent - 1]
@@ -0,0 +1,87 @@
+"""
+Catalog read latency while a burst of logins hits the same server.
+
+    python -m benchmarks.auth_storm --mode wsgi --mode asgi --seconds 10
+
+every server first serves catalog reads alone, then the same reads while `--login-clients` clients log in
+back to back. under WSGI sync workers a login holds its worker while hashing, under ASGI the async login
+view waits on the bounded hashing pool and turns the excess away with a 503.
+"""
+import argparse
+import random
+import threading
+
+from benchmarks import percentile, setup, test_database
+from benchmarks.load import request, run_clients, start_server, stop_server
+
+
+def phase(base_url, token, pages, args, with_logins):
+    catalog = lambda: request(f'{base_url}/api/v1/products/?page={random.randint(1, pages)}',
+                              headers={'Authorization': f'Bearer {token}'})
+    login = lambda: request(f'{base_url}/api/v1/auth/login', {'username': 'bench_user', 'password': 'bench1234'})
+
+    logins = []
+    storm = threading.Thread(target=lambda: logins.extend(run_clients(args.login_clients, login, args.seconds)))
+    if with_logins:
+        storm.start()
+    reads = run_clients(args.catalog_clients, catalog, args.seconds)
+    if with_logins:
+        storm.join()
+
+    durations = [duration for status, duration in reads if status == 200]
+    return {
+        'catalog_p50_ms': percentile(durations, 50) * 1000,
+        'catalog_p99_ms': percentile(durations, 99) * 1000,
+        'catalog_rps': len(durations) / args.seconds,
+        'logins_ok': sum(1 for status, _ in logins if status == 200),
+        'logins_503': sum(1 for status, _ in logins if status == 503),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', action='append', choices=('asgi', 'wsgi'))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--catalog-clients', type=int, default=4)
+    parser.add_argument('--login-clients', type=int, default=32)
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework_simplejwt.tokens import AccessToken
+    from product.models import Product
+
+    results = {}
+    with test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        Product.objects.bulk_create([
+            Product(title=f'product {i}', price=1000, description=f'description of product {i}', owner=user)
+            for i in range(args.products)
+        ])
+        token = str(AccessToken.for_user(user))
+        database = connection.settings_dict['NAME']
+        connection.close()
+
+        for mode in args.mode or ['asgi']:
+            server, base_url = start_server(mode, args.workers, database)
+            try:
+                pages = max(args.products // 20, 1)
+                results[mode] = {
+                    'idle': phase(base_url, token, pages, args, with_logins=False),
+                    'storm': phase(base_url, token, pages, args, with_logins=True),
+                }
+            finally:
+                stop_server(server)
+
+    print(f"{'mode':<6} {'phase':<6} {'p50 ms':>8} {'p99 ms':>9} {'reads/s':>8} {'logins':>7} {'503s':>6}")
+    for mode, phases in results.items():
+        for phase_name, result in phases.items():
+            print(f"{mode:<6} {phase_name:<6} {result['catalog_p50_ms']:>8.1f} {result['catalog_p99_ms']:>9.1f} "
+                  f"{result['catalog_rps']:>8.1f} {result['logins_ok']:>7} {result['logins_503']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Throughput of the bulk product endpoint against one POST /api/v1/products/ per product.
+
+    python -m benchmarks.bulk_create --count 1000
+"""
+import argparse
+
+from benchmarks import measure, setup, test_database
+
+
+def product_payload(index):
+    return {'title': f'product {index}', 'price': '1000.00', 'description': f'description of product {index}'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+    from product.models import Product
+
+    with test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        payloads = [product_payload(i) for i in range(args.count)]
+
+        def per_item():
+            for payload in payloads:
+                client.post('/api/v1/products/', payload, format='multipart')
+
+        def bulk():
+            batch = settings.BULK_CREATE_MAX_ITEMS
+            for start in range(0, len(payloads), batch):
+                client.post('/api/v1/products/bulk', {'products': payloads[start:start + batch]}, format='json')
+
+        [per_item_seconds] = measure(per_item)
+        [bulk_seconds] = measure(bulk)
+        assert Product.objects.count() == 2 * args.count
+
+    print(f"products:  {args.count}")
+    print(f"per item:  {per_item_seconds:.2f}s  {args.count / per_item_seconds:,.0f} products/s")
+    print(f"bulk:      {bulk_seconds:.2f}s  {args.count / bulk_seconds:,.0f} products/s")
+    print(f"speedup:   {per_item_seconds / bulk_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Throughput of concurrent editors of the same products under both update locking modes.
+
+    python -m benchmarks.concurrent_updates --seconds 10
+
+every client loops over a read of a random hot product (for its ETag and images) and a multipart PUT
+adding a new photo and dropping the oldest of three, sent with If-Match. a 409/412 is a lost race, the client
+reads the product again. `pessimistic` holds the row lock from the read to the commit, file writes
+included, `optimistic` only for the compare-and-set UPDATE.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from benchmarks import percentile, setup, test_database
+from benchmarks.load import run_clients, start_server, stop_server
+
+
+def send(url, method='GET', body=None, headers=None):
+    """
+    Send a request, returns `(status, response headers, parsed JSON body, seconds)`.
+    """
+    req = urllib.request.Request(url, body, headers or {}, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            status, response_headers, data = response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        status, response_headers, data = e.code, e.headers, e.read()
+    return status, response_headers, json.loads(data or b'null'), time.perf_counter() - start
+
+
+def multipart(fields, files):
+    """
+    Encode `fields` (name, value pairs) and `files` (name, filename, bytes) as multipart/form-data.
+    """
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content in files:
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                   f'Content-Type: image/png\r\n\r\n'.encode())
+        body.write(content + b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def edit(base_url, token, product_ids, photos):
+    """
+    Read a product and add an image to it, returns `(PUT status, seconds)`.
+    """
+    url = f'{base_url}/api/v1/products/{random.choice(product_ids)}'
+    auth = {'Authorization': f'Bearer {token}'}
+    status, headers, product, _ = send(url, headers=auth)
+    if status != 200:
+        return status, 0
+    kept = sorted(image['id'] for image in product['images'])
+    if len(kept) > 2:
+        kept = kept[1:]
+    body, content_type = multipart(
+        [('title', f'edited {random.random()}'), ('price', product['price']), ('description', product['description']),
+         *[('old_images_ids', image_id) for image_id in kept]],
+        [('new_images', 'photo.png', random.choice(photos))],
+    )
+    status, _, _, duration = send(url, 'PUT', body, {
+        **auth, 'Content-Type': content_type, 'If-Match': headers['ETag']
+    })
+    return status, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locking', action='append', choices=('optimistic', 'pessimistic'))
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--products', type=int, default=4, help="number of hot products all clients edit")
+    parser.add_argument('--seconds', type=int, default=10)
+    args = parser.parse_args()
+
+    # the servers write the new photos there too:
+    media_root = os.environ['MEDIA_ROOT'] = tempfile.mkdtemp()
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.core.files.base import ContentFile
+    from django.db import connection
+    from PIL import Image
+    from rest_framework_simplejwt.tokens import AccessToken
+    from product.models import Product, ProductImage
+
+    photos = []
+    for i in range(64):  # distinct contents, identical ones would share one stored file
+        file = io.BytesIO()
+        Image.new('RGB', size=(640, 480), color=(i * 4, 0, 255 - i * 4)).save(file, 'png')
+        photos.append(file.getvalue())
+
+    results = {}
+    with test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        product_ids = []
+        for i in range(args.products):
+            product = Product.objects.create(title=f'product {i}', price=1000, description='hot product', owner=user)
+            # an empty old_images_ids list can't be sent as multipart:
+            ProductImage.objects.create(product=product, image=ContentFile(photos[i % len(photos)], 'photo.png'))
+            product_ids.append(product.id)
+        token = str(AccessToken.for_user(user))
+        database = connection.settings_dict['NAME']
+        connection.close()
+
+        for locking in args.locking or ['pessimistic', 'optimistic']:
+            server, base_url = start_server('wsgi', args.workers, database, PRODUCT_UPDATE_LOCKING=locking)
+            try:
+                calls = run_clients(args.clients, lambda: edit(base_url, token, product_ids, photos), args.seconds)
+            finally:
+                stop_server(server)
+            durations = [duration for status, duration in calls if status == 200]
+            results[locking] = {
+                'updates_per_second': len(durations) / args.seconds,
+                'conflicts': sum(1 for status, _ in calls if status in (409, 412)),
+                'errors': sum(1 for status, _ in calls if status not in (200, 409, 412)),
+                'p50_ms': percentile(durations, 50) * 1000 if durations else 0,
+                'p99_ms': percentile(durations, 99) * 1000 if durations else 0,
+            }
+
+    shutil.rmtree(media_root)
+
+    print(f"{'locking':<12} {'updates/s':>10} {'conflicts':>10} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for locking, result in results.items():
+        print(f"{locking:<12} {result['updates_per_second']:>10.1f} {result['conflicts']:>10} {result['errors']:>7} "
+              f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
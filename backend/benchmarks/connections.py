@@ -0,0 +1,105 @@
+"""
+Latency and Postgres connection count of database bound requests with and without persistent connections.
+
+    python -m benchmarks.connections --concurrency 64 --seconds 15
+
+every setup serves authenticated product details (no response cache) from the same gunicorn workers.
+the connections of the servers are sampled from pg_stat_activity while the clients run: `opened` counts
+the distinct backends seen, a new connection per request shows up as a stream of short lived backends.
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks import percentile, setup, test_database
+from benchmarks.load import request, run_clients, start_server, stop_server
+
+
+# name: (server mode, DB_CONN_MAX_AGE)
+SETUPS = {
+    'wsgi, per request': ('wsgi', 0),
+    'wsgi, persistent': ('wsgi', 60),
+    'asgi, per request': ('asgi', 0),
+}
+
+
+def sample_connections(database, stop, samples, backends):
+    """
+    Record the number of open connections to `database` every 10ms until `stop` is set.
+    """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        while not stop.is_set():
+            cursor.execute(
+                "SELECT pid, backend_start FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()",
+                [database]
+            )
+            rows = cursor.fetchall()
+            samples.append(len(rows))
+            backends.update(rows)
+            time.sleep(0.01)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--setup', action='append', choices=SETUPS)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--seconds', type=int, default=15)
+    parser.add_argument('--products', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework_simplejwt.tokens import AccessToken
+    from product.models import Product
+
+    results = {}
+    with test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        ids = [product.id for product in Product.objects.bulk_create([
+            Product(title=f'product {i}', price=1000 + i, description=f'description of product {i}', owner=user)
+            for i in range(args.products)
+        ])]
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        database = connection.settings_dict['NAME']
+        connection.close()
+
+        for name in args.setup or SETUPS:
+            mode, max_age = SETUPS[name]
+            server, base_url = start_server(mode, args.workers, database, DB_CONN_MAX_AGE=max_age)
+            stop, samples, backends = threading.Event(), [], set()
+            sampler = threading.Thread(target=sample_connections, args=(database, stop, samples, backends))
+            sampler.start()
+            try:
+                calls = run_clients(
+                    args.concurrency,
+                    lambda: request(f'{base_url}/api/v1/products/{random.choice(ids)}', headers=headers),
+                    args.seconds
+                )
+            finally:
+                stop.set()
+                sampler.join()
+                stop_server(server)
+            durations = [duration for status, duration in calls if status == 200]
+            results[name] = {
+                'rps': len(durations) / args.seconds,
+                'p50_ms': percentile(durations, 50) * 1000,
+                'p99_ms': percentile(durations, 99) * 1000,
+                'errors': len(calls) - len(durations),
+                'peak_connections': max(samples, default=0),
+                'opened_connections': len(backends),
+            }
+
+    print(f"{'setup':<18} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'peak conn':>10} {'opened':>7}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['errors']:>7} {result['peak_connections']:>10} {result['opened_connections']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Cost of resolving the user of a JWT: simplejwt's JWTAuthentication against the cached one.
+
+    python -m benchmarks.jwt_auth --repeat 2000
+"""
+import argparse
+
+from benchmarks import measure, percentile, setup, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt import authentication as simplejwt
+    from rest_framework_simplejwt.tokens import AccessToken
+    from authentication.authentication import JWTAuthentication
+
+    with test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+        print(f"{'authentication':<16} {'p50 us':>8} {'p99 us':>8} {'queries/request':>16}")
+        for name, authenticator in (('simplejwt', simplejwt.JWTAuthentication()), ('cached', JWTAuthentication())):
+            authenticator.authenticate(request)  # warm up
+            with CaptureQueriesContext(connection) as queries:
+                durations = measure(lambda: authenticator.authenticate(request), args.repeat)
+            print(f"{name:<16} {percentile(durations, 50) * 1e6:>8.1f} {percentile(durations, 99) * 1e6:>8.1f} "
+                  f"{len(queries) / args.repeat:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
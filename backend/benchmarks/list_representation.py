@@ -0,0 +1,105 @@
+"""
+Payload size and serialization time of a product list page in the full and the compact representations.
+
+    python -m benchmarks.list_representation --products 1000 --repeat 50
+
+the request time is the whole anonymous GET with an empty response cache, the serialization time
+only covers the serializer and the JSON renderer over the page already fetched with its images
+(the stdlib JSONRenderer for the DRF serializers, the orjson one for the fast reads).
+the query counts are checked by the product_list scenarios of benchmarks.suite.
+"""
+import argparse
+import shutil
+import tempfile
+
+from benchmarks import measure, percentile, setup, test_database
+from benchmarks.suite import seed_catalog
+
+
+# name: (query params, PRODUCT_FAST_READS)
+REPRESENTATIONS = {
+    'full': ({}, False),
+    'full, fast reads': ({}, True),
+    'compact': ({'fields': ''}, False),
+    'compact+images': ({'expand': 'images'}, False),
+    'title,price': ({'fields': 'title,price'}, False),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--images', type=int, default=3, help="images per product")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.db.models import prefetch_related_objects
+    from django.test.utils import override_settings
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIClient, APIRequestFactory
+    from core.renderers import ORJSONRenderer
+    from product.api.rows import ProductRow, product_rows, serialize_products
+    from product.api.serializers import ProductCreateSerializer, ProductListSerializer
+    from product.models import Product
+    from product.utils import generate_photo_file
+
+    media_root = tempfile.mkdtemp()
+    results = {}
+    with override_settings(MEDIA_ROOT=media_root), test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        image_name = default_storage.save('product_images/bench.png', ContentFile(generate_photo_file().read()))
+        seed_catalog(user, args.products, args.images, image_name)
+        client = APIClient()
+
+        for name, (params, fast) in REPRESENTATIONS.items():
+            request = Request(APIRequestFactory().get('/api/v1/products/', params))
+            fields = ProductListSerializer.parse_fields(request.query_params)
+            queryset = Product.objects.order_by('-id')
+            if fast:
+                page = [ProductRow(row) for row in product_rows(queryset)[:20]]
+            else:
+                if fields is not None:
+                    queryset = ProductListSerializer.setup_queryset(queryset, fields)
+                page = list(queryset[:20])
+                if fields is None or 'images' in fields:
+                    prefetch_related_objects(page, 'images')
+
+            def serialize():
+                context = {'request': request}
+                if fast:
+                    return ORJSONRenderer().render(serialize_products(page, request))
+                if fields is None:
+                    data = ProductCreateSerializer(page, many=True, context=context).data
+                else:
+                    data = ProductListSerializer(page, many=True, fields=fields, context=context).data
+                return JSONRenderer().render(data)
+
+            def get():
+                cache.clear()
+                with override_settings(PRODUCT_FAST_READS=fast):
+                    return client.get('/api/v1/products/', params)
+
+            response = get()
+            serialization = measure(serialize, args.repeat)
+            requests = measure(get, args.repeat)
+            results[name] = {
+                'bytes': len(response.content),
+                'serialize_p50_ms': percentile(serialization, 50) * 1000,
+                'request_p50_ms': percentile(requests, 50) * 1000,
+            }
+    shutil.rmtree(media_root)
+
+    print(f"{'representation':<18} {'bytes':>8} {'serialize ms':>13} {'request ms':>11}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['bytes']:>8} {result['serialize_p50_ms']:>13.2f} "
+              f"{result['request_p50_ms']:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Helpers of the benchmarks driving a real server over HTTP.
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, workers, database, **env):
+    """
+    Start gunicorn with gunicorn.conf.py in `mode` (asgi/wsgi) against `database`, returns `(process, base url)`.
+    """
+    port = free_port()
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py'], stderr=subprocess.DEVNULL,
+                              start_new_session=True, env={
+        **os.environ,
+        'SERVER_MODE': mode,
+        'WEB_CONCURRENCY': str(workers),
+        'BIND': f'127.0.0.1:{port}',
+        'DB_NAME': database,
+        # the workers share a cache, as gunicorn.conf.py requires:
+        'CACHE_BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'CACHE_LOCATION': os.path.join(tempfile.gettempdir(), f'toman-shop-cache-{port}'),
+        **{name: str(value) for name, value in env.items()},
+    })
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/api/v1/products/', timeout=1)
+            return server, base_url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.2)
+    stop_server(server)
+    raise SystemExit(f"{mode} server did not start")
+
+
+def stop_server(server):
+    # signal the workers too, one outliving its arbiter would hold the port and the output pipes
+    os.killpg(server.pid, signal.SIGTERM)
+    server.wait()
+
+
+def request(url, data=None, headers=None):
+    """
+    Send a GET (or a JSON POST when `data` is given), returns `(status, seconds)`.
+    """
+    body = None if data is None else json.dumps(data).encode()
+    req = urllib.request.Request(url, body, {'Content-Type': 'application/json', **(headers or {})})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        status = None
+    return status, time.perf_counter() - start
+
+
+def run_clients(count, func, seconds):
+    """
+    Call `func` back to back from `count` threads for `seconds`, returns the results of all calls.
+    """
+    stop = threading.Event()
+    results = []
+
+    def client():
+        while not stop.is_set():
+            results.append(func())
+
+    threads = [threading.Thread(target=client) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results
@@ -0,0 +1,70 @@
+"""
+Requests per second and tail latency of the product reads, ASGI (uvicorn workers) against WSGI (sync workers).
+
+    python -m benchmarks.servers --concurrency 64 --seconds 15
+
+both modes are started through gunicorn.conf.py with the same number of workers.
+`--anonymous` reads go through the response cache, authenticated ones hit the database on every request.
+"""
+import argparse
+import random
+
+from benchmarks import percentile, setup, test_database
+from benchmarks.load import request, run_clients, start_server, stop_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', action='append', choices=('asgi', 'wsgi'))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--seconds', type=int, default=15)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--anonymous', action='store_true')
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework_simplejwt.tokens import AccessToken
+    from product.models import Product
+
+    results = {}
+    with test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        ids = [product.id for product in Product.objects.bulk_create([
+            Product(title=f'product {i}', price=1000 + i, description=f'description of product {i}', owner=user)
+            for i in range(args.products)
+        ])]
+        headers = {} if args.anonymous else {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        database = connection.settings_dict['NAME']
+        connection.close()
+
+        for mode in args.mode or ['wsgi', 'asgi']:
+            server, base_url = start_server(mode, args.workers, database)
+            try:
+                scenarios = {
+                    'list': lambda: request(f'{base_url}/api/v1/products/?page={random.randint(1, 50)}',
+                                            headers=headers),
+                    'detail': lambda: request(f'{base_url}/api/v1/products/{random.choice(ids)}', headers=headers),
+                }
+                for name, call in scenarios.items():
+                    calls = run_clients(args.concurrency, call, args.seconds)
+                    durations = [duration for status, duration in calls if status == 200]
+                    results[mode, name] = {
+                        'rps': len(durations) / args.seconds,
+                        'p50_ms': percentile(durations, 50) * 1000,
+                        'p99_ms': percentile(durations, 99) * 1000,
+                        'errors': len(calls) - len(durations),
+                    }
+            finally:
+                stop_server(server)
+
+    print(f"{'mode':<6} {'endpoint':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'errors':>7}")
+    for (mode, name), result in results.items():
+        print(f"{mode:<6} {name:<8} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p99_ms']:>9.1f} "
+              f"{result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
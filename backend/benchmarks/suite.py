@@ -0,0 +1,278 @@
+"""
+Latency, throughput and SQL query counts of the main API endpoints, checked against the budgets in budgets.json.
+
+    python -m benchmarks.suite --products 1000 --report report.json
+    python -m benchmarks.suite --products 100000 --baseline report.json
+
+the catalog is seeded with `--images` images per product (MAX_IMG_PER_PRODUCT by default).
+the process exits with status 1 if a scenario goes over its budget, the JSON report has one entry per scenario
+and could be diffed between commits or passed back as `--baseline`.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from benchmarks import measure, percentile, setup, test_database
+
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'budgets.json')
+SEED_BATCH_SIZE = 5000
+
+
+class Scenario:
+    """
+    One endpoint call, `prepare` runs before every call outside of the measured time and returns its arguments.
+    """
+
+    def __init__(self, name, call, expected_status, prepare=None, repeat=50):
+        self.name = name
+        self.call = call
+        self.expected_status = expected_status
+        self.prepare = prepare or (lambda: ())
+        self.repeat = repeat
+
+
+def seed_catalog(user, products, images_per_product, image_name):
+    from product.models import Product, ProductImage
+
+    numbers = iter(range(products))
+    while batch := list(itertools.islice(numbers, SEED_BATCH_SIZE)):
+        created = Product.objects.bulk_create([
+            Product(
+                title=f'product {i}',
+                price=Decimal(1000 + i % 5000),
+                description=f'description of product {i}, seeded by the benchmark suite',
+                owner=user,
+                image_count=images_per_product,
+            )
+            for i in batch
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=image_name)
+            for product in created for _ in range(images_per_product)
+        ], batch_size=SEED_BATCH_SIZE)
+
+
+def build_scenarios(client, anonymous, user, repeat):
+    from django.core.cache import cache
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from product.models import Product, ProductImage
+    from product.utils import generate_photo_file
+
+    product_ids = list(Product.objects.order_by('-id').values_list('id', flat=True)[:repeat * 10])
+    reads, deletes = iter(itertools.cycle(product_ids)), iter(product_ids[::-1])
+    users = itertools.count()
+    refresh = str(RefreshToken.for_user(user))
+    middle_page = max(Product.objects.count() // 2 // 20, 1)
+
+    def cold(*args):
+        def prepare():
+            cache.clear()
+            return args
+        return prepare
+
+    def warm():
+        anonymous.get('/api/v1/products/')
+        return ()
+
+    def next_read():
+        cache.clear()
+        return (next(reads),)
+
+    def next_update():
+        pk = next(reads)
+        # keep all images but the last one, so the update also removes an image:
+        image_ids = list(ProductImage.objects.filter(product_id=pk).order_by('id').values_list('id', flat=True))
+        return pk, image_ids[:-1]
+
+    def next_user():
+        return (f'bench_{next(users)}',)
+
+    def signed_in(prepare=lambda: ()):
+        # the token user is cached by the first request of a client, the writes are measured with it cached
+        # as in test_query_budgets (the read scenarios before them clear the cache):
+        def wrapped():
+            client.get('/api/v1/products/0')
+            return prepare()
+        return wrapped
+
+    return [
+        Scenario('product_list', lambda: anonymous.get('/api/v1/products/'), 200, cold(), repeat),
+        Scenario('product_list_cached', lambda: anonymous.get('/api/v1/products/'), 200, warm, repeat),
+        Scenario('product_list_middle_page',
+                 lambda page: anonymous.get('/api/v1/products/', {'page': page}), 200, cold(middle_page), repeat),
+        Scenario('product_list_cursor',
+                 lambda: anonymous.get('/api/v1/products/', {'pagination': 'cursor'}), 200, cold(), repeat),
+        Scenario('product_list_filtered',
+                 lambda: anonymous.get('/api/v1/products/', {'min_price': '2000', 'ordering': 'price'}),
+                 200, cold(), repeat),
+        Scenario('product_list_compact',
+                 lambda: anonymous.get('/api/v1/products/', {'fields': 'id,title,price,thumbnail'}),
+                 200, cold(), repeat),
+        Scenario('product_search', lambda: anonymous.get('/api/v1/products/', {'q': 'seeded'}), 200, cold(), repeat),
+        Scenario('product_detail', lambda pk: anonymous.get(f'/api/v1/products/{pk}'), 200, next_read, repeat),
+        Scenario('product_create', lambda: client.post('/api/v1/products/', {
+            'title': 'new product', 'price': '1000.00', 'description': 'created by the benchmark suite',
+            'new_images': [generate_photo_file()],
+        }, format='multipart'), 201, signed_in(), repeat),
+        Scenario('product_update', lambda pk, image_ids: client.put(f'/api/v1/products/{pk}', {
+            'title': 'updated product', 'price': '2000.00', 'description': 'updated by the benchmark suite',
+            'old_images_ids': image_ids,
+        }, format='multipart'), 200, signed_in(next_update), repeat),
+        Scenario('product_delete', lambda pk: client.delete(f'/api/v1/products/{pk}'), 204,
+                 signed_in(lambda: (next(deletes),)), repeat),
+        # password hashing dominates these, they are sampled less:
+        Scenario('auth_register', lambda username: anonymous.post('/api/v1/auth/register', {
+            'username': username, 'email': f'{username}@example.com',
+            'password': 'bench1234', 'repeat_password': 'bench1234',
+        }, format='json'), 200, next_user, max(repeat // 5, 2)),
+        Scenario('auth_login', lambda: anonymous.post('/api/v1/auth/login', {
+            'username': user.username, 'password': 'bench1234',
+        }, format='json'), 200, repeat=max(repeat // 5, 2)),
+        Scenario('auth_token_refresh', lambda: anonymous.post('/api/v1/auth/token/refresh', {
+            'refresh': refresh,
+        }, format='json'), 200, repeat=repeat),
+    ]
+
+
+def run_scenario(scenario):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    durations, queries = [], []
+    for _ in range(scenario.repeat):
+        args = scenario.prepare()
+        with CaptureQueriesContext(connection) as captured:
+            [duration] = measure(lambda: check_status(scenario, scenario.call(*args)))
+        durations.append(duration)
+        queries.append(len(captured))
+
+    return {
+        'requests': len(durations),
+        'p50_ms': round(percentile(durations, 50) * 1000, 2),
+        'p99_ms': round(percentile(durations, 99) * 1000, 2),
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 2),
+        'throughput_rps': round(len(durations) / sum(durations), 1),
+        'queries': max(queries),
+    }
+
+
+def check_status(scenario, response):
+    if response.status_code != scenario.expected_status:
+        raise SystemExit(f"{scenario.name}: expected {scenario.expected_status}, got {response.status_code}")
+
+
+def check_budgets(results, budgets):
+    """
+    Return one message per metric over its budget, a budget is `{"queries": max, "p99_ms": max, ...}`.
+    """
+    violations = []
+    for name, budget in budgets.items():
+        if name not in results:
+            continue
+        for metric, limit in budget.items():
+            if results[name][metric] > limit:
+                violations.append(f"{name}: {metric} {results[name][metric]} > {limit}")
+    return violations
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline):
+    print(f"{'scenario':<26} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8}")
+    for name, result in results.items():
+        line = (f"{name:<26} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+                f"{result['throughput_rps']:>8} {result['queries']:>8}")
+        if name in baseline:
+            old = baseline[name]
+            line += (f"   (p50 {result['p50_ms'] - old['p50_ms']:+.2f}, "
+                     f"queries {result['queries'] - old['queries']:+d})")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--images', type=int, help="images per product, MAX_IMG_PER_PRODUCT by default")
+    parser.add_argument('--repeat', type=int, default=50, help="requests per scenario")
+    parser.add_argument('--scenario', action='append', help="only run the given scenario, could be repeated")
+    parser.add_argument('--budgets', default=BUDGETS_FILE)
+    parser.add_argument('--report', help="write the JSON report to this file")
+    parser.add_argument('--baseline', help="JSON report of an earlier run to compare with")
+    args = parser.parse_args()
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+    from product import tasks
+    from product.models import MAX_IMG_PER_PRODUCT
+    from product.utils import generate_photo_file
+
+    images = MAX_IMG_PER_PRODUCT if args.images is None else args.images
+    media_root = tempfile.mkdtemp()
+    with override_settings(MEDIA_ROOT=media_root), test_database():
+        user = get_user_model().objects.create_user(username='bench_user', password='bench1234')
+        image_name = default_storage.save('product_images/bench.png', ContentFile(generate_photo_file().read()))
+        seed_catalog(user, args.products, images, image_name)
+
+        client, anonymous = APIClient(), APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        results = {}
+        for scenario in build_scenarios(client, anonymous, user, args.repeat):
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            results[scenario.name] = run_scenario(scenario)
+
+        # let pending image variant jobs finish before the test database is dropped:
+        tasks.get_executor().shutdown(wait=True)
+        tasks._executor = None
+    shutil.rmtree(media_root)
+
+    with open(args.budgets) as file:
+        violations = check_budgets(results, json.load(file))
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['scenarios']
+
+    report = {
+        'revision': git_revision(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'products': args.products,
+        'images_per_product': images,
+        'scenarios': results,
+        'violations': violations,
+    }
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write('\n')
+
+    print_results(results, baseline)
+    for violation in violations:
+        print(f"over budget: {violation}", file=sys.stderr)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import contextlib
+import contextvars
+import ipaddress
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request',
+    ['view', 'method', 'status']
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries run per request',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in SQL queries per request',
+    ['view']
+)
+STAGE_DURATION = Histogram(
+    'http_request_stage_duration_seconds', 'Time spent per request in auth, rendering and file storage',
+    ['view', 'stage']
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of the rendered response body',
+    ['view'], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Time spent per stage of the current request, `db` is filled by QueryTimer and the others by `timed()`.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.queries = 0
+
+    def add(self, stage, seconds):
+        self.stages[stage] += seconds
+
+    def server_timing(self, total):
+        entries = []
+        for stage, seconds in self.stages.items():
+            entry = f'{stage};dur={seconds * 1000:.1f}'
+            if stage == 'db':
+                entry += f';desc="{self.queries} queries"'
+            entries.append(entry)
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+class QueryTimer:
+    """
+    Database `execute_wrapper` counting and timing the queries of the current request, see `install_query_timer`.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        timings = _current.get()
+        if timings is None:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.queries += 1
+            timings.add('db', time.perf_counter() - start)
+
+
+query_timer = QueryTimer()
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    `connection_created` receiver wrapping every connection with the query timer.
+    connections belong to a thread, the queries sync_to_async runs in other threads than the one of the
+    middleware are recorded as the request context follows them there.
+    """
+    # sent again when a persistent connection is reopened. first in the list, the wrappers pushed and popped
+    # by `connection.execute_wrapper()` stay last:
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, query_timer)
+
+
+def activate(timings):
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def current_timings():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def timed(stage):
+    """
+    Add the time spent in the block to `stage` of the current request, a no-op outside of a request.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+
+def observe(view, method, status, timings, duration, size=None):
+    REQUEST_DURATION.labels(view, method, status).observe(duration)
+    DB_QUERIES.labels(view).observe(timings.queries)
+    DB_DURATION.labels(view).observe(timings.stages.get('db', 0))
+    for stage, seconds in timings.stages.items():
+        if stage != 'db':
+            STAGE_DURATION.labels(view, stage).observe(seconds)
+    if size is not None:
+        RESPONSE_SIZE.labels(view).observe(size)
+
+
+def metrics_view(request):
+    """
+    Prometheus exposition of the metrics, aggregated over all workers when PROMETHEUS_MULTIPROC_DIR is set.
+    only clients of METRICS_ALLOWED_NETWORKS get it.
+    """
+    address = ipaddress.ip_address(request.META['REMOTE_ADDR'])
+    if not any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
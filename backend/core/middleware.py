@@ -0,0 +1,114 @@
+import contextlib
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from core import metrics, routers
+
+
+class RequestMetricsMiddleware:
+    """
+    Record duration, SQL query count/time, auth/render/storage time and response size of every request.
+    they are observed as Prometheus histograms labeled by view and sent back in a `Server-Timing` header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django would run the sync hook in a worker thread:
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.instrument() as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        with self.instrument() as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings)
+
+    @contextlib.contextmanager
+    def instrument(self):
+        timings = metrics.RequestTimings()
+        # the queries are recorded by metrics.query_timer, in every thread the request context is copied to:
+        token = metrics.activate(timings)
+        try:
+            yield timings
+        finally:
+            metrics.deactivate(token)
+
+    def finish(self, request, response, timings):
+        duration = time.perf_counter() - timings.start
+        match = request.resolver_match
+        metrics.observe(
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=response.status_code,
+            timings=timings,
+            duration=duration,
+            size=None if response.streaming else len(response.content)
+        )
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(duration)
+        return response
+
+    def process_template_response(self, request, response):
+        return self.time_render(response)
+
+    async def aprocess_template_response(self, request, response):
+        return self.time_render(response)
+
+    def time_render(self, response):
+        # DRF responses are rendered right after the template response middleware ran:
+        timings = metrics.current_timings()
+        if timings is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda _: timings.add('render', time.perf_counter() - start))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe requests to a database replica, see core.routers.
+    a no-op unless DB_REPLICAS lists replicas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = routers.begin(request.method)
+        status_code = 500
+        try:
+            response = self.get_response(request)
+            status_code = response.status_code
+        finally:
+            routers.end(token, status_code)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        token = routers.begin(request.method)
+        status_code = 500
+        try:
+            response = await self.get_response(request)
+            status_code = response.status_code
+        finally:
+            routers.end(token, status_code)
+        return response
@@ -0,0 +1,29 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with the compact output encoded by orjson, byte for byte the same JSON.
+    indented output asked for in the Accept header, and data orjson refuses (e.g. integers over 64 bits
+    or non string keys), are rendered by the stdlib encoder. NaN and infinite floats become null instead of NaN.
+    """
+    # datetimes go through the DRF encoder like every other type orjson has no native support for:
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encoder.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # escaped by JSONRenderer as they are invalid in javascript strings:
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
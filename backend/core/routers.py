@@ -0,0 +1,84 @@
+"""
+Routing of request reads to the database replicas.
+reads outside of a request (background jobs, commands) and the reads and writes of unsafe requests use the primary.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_KEY = 'db:primary-pin:{user_id}'
+
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+
+class RequestRouting:
+    """
+    Database routing of one request, its reads go to one replica unless it's pinned to the primary.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.pinned = method not in SAFE_METHODS
+        self.replica = random.choice(settings.DATABASE_REPLICAS)
+        self.user_id = None
+
+
+def begin(method):
+    return _routing.set(RequestRouting(method))
+
+
+def end(token, status_code):
+    """
+    Leave the request, a successful write pins its user to the primary for READ_YOUR_WRITES_WINDOW seconds.
+    """
+    routing = _routing.get()
+    _routing.reset(token)
+    if routing.method not in SAFE_METHODS and routing.user_id is not None and status_code < 400:
+        cache.set(PIN_KEY.format(user_id=routing.user_id), True, timeout=settings.READ_YOUR_WRITES_WINDOW)
+
+
+def user_authenticated(user_id):
+    """
+    Called with the user of the request once known, the next reads use the primary if they wrote recently.
+    """
+    routing = _routing.get()
+    if routing is None:
+        return
+    routing.user_id = user_id
+    if not routing.pinned and cache.get(PIN_KEY.format(user_id=user_id)):
+        routing.pinned = True
+
+
+def read_alias():
+    routing = _routing.get()
+    if routing is None or routing.pinned:
+        return DEFAULT_DB_ALIAS
+    return routing.replica
+
+
+class ReplicaRouter:
+    """
+    Writes, select_for_update and migrations use the primary, reads follow the request routing.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        # related objects are read from the database their instance came from:
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary:
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
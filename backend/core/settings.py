@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 from datetime import timedelta
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,9 +39,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 # local apps:
 INSTALLED_APPS += [
+    'core.apps.CoreConfig',
     'product.apps.ProductConfig',
     'authentication.apps.AuthenticationConfig',
 ]
@@ -62,6 +64,8 @@ SPECTACULAR_SETTINGS = {
 }
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +99,9 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# wsgi (sync workers) or asgi (uvicorn workers), see gunicorn.conf.py:
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -103,8 +110,50 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432', cast=int),
+        # seconds a connection is reused by the next requests of its thread, 0 closes it after every request.
+        # under ASGI every request runs its queries in another thread, persistent connections would pile up:
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0 if SERVER_MODE == 'asgi' else 60, cast=int),
+        # a reused connection is checked before the first query of a request, dead ones are replaced:
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+    }
+}
+# streaming replicas of the default database as comma separated `host[:port]`, safe requests read from one of them:
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), 1):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port) if port else DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# the test suite runs with the replica routing off, see core.test_runner:
+TEST_RUNNER = 'core.test_runner.TestRunner'
+# seconds the reads of a user stay on the primary after a write of theirs:
+READ_YOUR_WRITES_WINDOW = config('READ_YOUR_WRITES_WINDOW', default=5, cast=int)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+# the product responses, the JWT users and the read-your-writes pins are invalidated through this cache,
+# more than one server process needs a shared one, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and CACHE_LOCATION=redis://redis:6379/0 (see gunicorn.conf.py):
+CACHE_BACKEND = config('CACHE_BACKEND', default=LOCAL_CACHE_BACKEND)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='toman-shop'),
     }
 }
+if CACHE_BACKEND == LOCAL_CACHE_BACKEND:
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5000, cast=int)}
+# seconds a cached product list/detail payload stays valid (writes invalidate it earlier):
+PRODUCT_CACHE_TIMEOUT = config('PRODUCT_CACHE_TIMEOUT', default=300, cast=int)
+# seconds shared caches (the nginx proxy cache) keep anonymous product responses, sent as s-maxage:
+PRODUCT_PROXY_CACHE_TIMEOUT = config('PRODUCT_PROXY_CACHE_TIMEOUT', default=5, cast=int)
 
 
 # Password validation
@@ -112,15 +161,21 @@ DATABASES = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.JWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(config('ACCESS_TOKEN_LIFETIME'))),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=int(config('REFRESH_TOKEN_LIFETIME'))),
 }
+# seconds the user of a JWT is served from cache (user saves/deletes invalidate it earlier):
+JWT_USER_CACHE_TIMEOUT = config('JWT_USER_CACHE_TIMEOUT', default=60, cast=int)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -153,7 +208,62 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 # Media
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+# internal nginx location serving MEDIA_ROOT, access-controlled files are handed to nginx with X-Accel-Redirect.
+# empty when no nginx is in front (runserver), Django streams them then:
+MEDIA_ACCEL_REDIRECT_URL = config('MEDIA_ACCEL_REDIRECT_URL', default='')
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.storage.InstrumentedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# longest side (px) of the renditions generated for every product image:
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': config('IMAGE_THUMBNAIL_SIZE', default=200, cast=int),
+    'medium': config('IMAGE_MEDIUM_SIZE', default=800, cast=int),
+}
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', default=80, cast=int)
+# chunked image uploads are assembled here before moving to the media storage:
+UPLOAD_STAGING_DIR = config('UPLOAD_STAGING_DIR', default=os.path.join(BASE_DIR, 'uploads'))
+# seconds a chunk holds its upload, a chunk whose client stalled longer is taken over by the next one:
+UPLOAD_CHUNK_LEASE = config('UPLOAD_CHUNK_LEASE', default=300, cast=int)
+# seconds an upload may wait for its product before clear_image_uploads removes it:
+IMAGE_UPLOAD_EXPIRY = config('IMAGE_UPLOAD_EXPIRY', default=24 * 3600, cast=int)
+
+# Bulk product creation / import / export
+BULK_CREATE_MAX_ITEMS = config('BULK_CREATE_MAX_ITEMS', default=1000, cast=int)
+BULK_CREATE_BATCH_SIZE = config('BULK_CREATE_BATCH_SIZE', default=500, cast=int)
+# products read per round trip of the streaming catalog export:
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# rows copied and upserted per transaction by the import_products command:
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=5000, cast=int)
+
+# `optimistic` product updates read without lock and compare-and-set the row version (409/412 on conflict),
+# `pessimistic` ones lock the row with select_for_update until the update commits:
+PRODUCT_UPDATE_LOCKING = config('PRODUCT_UPDATE_LOCKING', default='optimistic')
+# product list/detail GETs build their JSON from values() rows instead of the DRF serializers:
+PRODUCT_FAST_READS = config('PRODUCT_FAST_READS', default=False, cast=bool)
+
+# Background jobs (image processing, ...)
+BACKGROUND_WORKERS = config('BACKGROUND_WORKERS', default=2, cast=int)
+# run jobs in the calling thread right after commit instead of the worker pool:
+BACKGROUND_EAGER = config('BACKGROUND_EAGER', default=False, cast=bool)
+# queued media deletions handled per transaction of the sweeper:
+MEDIA_SWEEP_BATCH_SIZE = config('MEDIA_SWEEP_BATCH_SIZE', default=500, cast=int)
+
+# Password hashing pool of login/register
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=2, cast=int)
+# hashing jobs allowed to wait for the pool, further logins/registrations get a 503:
+PASSWORD_HASHING_MAX_PENDING = config('PASSWORD_HASHING_MAX_PENDING', default=32, cast=int)
+
+# Instrumentation
+# send per request db/auth/render/storage timings back in a Server-Timing header:
+SERVER_TIMING = config('SERVER_TIMING', default=True, cast=bool)
+# networks allowed to scrape /metrics, e.g. the one of the Prometheus container:
+METRICS_ALLOWED_NETWORKS = config('METRICS_ALLOWED_NETWORKS', default='127.0.0.1/32,::1/128', cast=Csv())
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -0,0 +1,44 @@
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+
+from core.metrics import timed
+
+
+class InstrumentedFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage recording the time spent reading, writing and deleting files as `storage`.
+    """
+
+    def _open(self, name, mode='rb'):
+        with timed('storage'):
+            return super()._open(name, mode)
+
+    def _save(self, name, content):
+        with timed('storage'):
+            return super()._save(name, content)
+
+    def delete(self, name):
+        with timed('storage'):
+            return super().delete(name)
+
+
+def media_response(name, storage=default_storage):
+    """
+    Send the media file `name` to a client the view authorized.
+    behind nginx (MEDIA_ACCEL_REDIRECT_URL set) the response only names the file in its internal location with
+    X-Accel-Redirect and nginx sends it with sendfile, Django streams the file otherwise.
+    """
+    if not storage.exists(name):
+        raise Http404
+    if settings.MEDIA_ACCEL_REDIRECT_URL:
+        response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_URL + quote(name)
+    else:
+        response = FileResponse(storage.open(name))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
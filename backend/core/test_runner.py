@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner keeping the reads on the primary whatever DB_REPLICAS lists: the tests only declare the
+    default database. product.tests.test_replicas enables the routing with override_settings(DATABASE_REPLICAS=...).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.database_replicas, settings.DATABASE_REPLICAS = settings.DATABASE_REPLICAS, []
+
+    def teardown_test_environment(self, **kwargs):
+        settings.DATABASE_REPLICAS = self.database_replicas
+        super().teardown_test_environment(**kwargs)
@@ -4,10 +4,13 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/products/', include('product.api.urls')),
     path('api/v1/auth/', include('authentication.api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 urlpatterns += [
@@ -0,0 +1,73 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers could be coroutines, served without a thread of its own under ASGI.
+    under ASGI an `a<method>` handler (e.g. `aget`) is preferred to the `<method>` one. under WSGI the view is sync
+    and runs the sync handlers directly, without the event loop Django would start per request for an async view.
+    authentication, permission and throttle checks may query the database, under ASGI they run in a worker thread
+    like the handlers which are not coroutines (e.g. writes of a view whose reads are async).
+    """
+    # Django refuses views mixing sync and async handlers, adispatch runs the sync ones in a thread:
+    view_is_async = settings.SERVER_MODE == 'asgi'
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        if initkwargs.get('view_is_async', cls.view_is_async):
+            markcoroutinefunction(view)
+        return view
+
+    def get_handler(self, request):
+        method = request.method.lower()
+        if method not in self.http_method_names:
+            return self.http_method_not_allowed
+        if self.view_is_async and hasattr(self, f'a{method}'):
+            return getattr(self, f'a{method}')
+        return getattr(self, method, self.http_method_not_allowed)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+            handler = self.get_handler(request)
+            if iscoroutinefunction(handler):
+                # async only handler, e.g. login which waits for the hashing pool:
+                response = async_to_sync(handler)(request, *args, **kwargs)
+            else:
+                response = handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def adispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = self.get_handler(request)
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,54 @@
+"""
+Gunicorn settings, run with `gunicorn -c gunicorn.conf.py`.
+
+SERVER_MODE=wsgi (default) serves core.wsgi with sync workers, one request at a time per worker.
+SERVER_MODE=asgi serves core.asgi with uvicorn workers: product reads, login and register run as async views
+on the event loop of every worker and other views in threads (sized by ASGI_THREADS).
+"""
+import multiprocessing
+import os
+import shutil
+
+# not `from decouple import config`, gunicorn would read `config` as one of its settings
+import decouple
+
+
+SERVER_MODE = decouple.config('SERVER_MODE', default='wsgi')
+# invalidations of the local memory cache (core.settings CACHES) only reach the worker which made them:
+LOCAL_CACHE = decouple.config('CACHE_BACKEND', default='') in ('', 'django.core.cache.backends.locmem.LocMemCache')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # an event loop keeps a core busy, more workers than cores only add context switches:
+    default_workers = multiprocessing.cpu_count()
+else:
+    wsgi_app = 'core.wsgi:application'
+    worker_class = 'sync'
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+
+workers = decouple.config('WEB_CONCURRENCY', default=1 if LOCAL_CACHE else default_workers, cast=int)
+if workers > 1 and LOCAL_CACHE:
+    raise RuntimeError(
+        f"{workers} workers need a cache they share, set CACHE_BACKEND and CACHE_LOCATION or WEB_CONCURRENCY=1"
+    )
+bind = decouple.config('BIND', default='0.0.0.0:8000')
+timeout = decouple.config('WORKER_TIMEOUT', default=30, cast=int)
+keepalive = 5
+# workers are recycled after that many requests, bounds slow memory growth:
+max_requests = decouple.config('WORKER_MAX_REQUESTS', default=10000, cast=int)
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    # metrics files of the previous run would be summed with the new ones:
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,85 @@
+from rest_framework import serializers
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    `?q=<terms>` filters products by full text search, supports "quoted phrases", `or` and -exclusion.
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        return queryset.search(term)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full text search over title and description',
+            'schema': {'type': 'string'},
+        }]
+
+
+class ProductFilter(BaseFilterBackend):
+    """
+    `?min_price=` / `?max_price=` price range, `?owner=<user id>` and `?mine=true` for the requesting user's products.
+    """
+    price_field = serializers.DecimalField(max_digits=12, decimal_places=2)
+    owner_field = serializers.IntegerField(min_value=1)
+    mine_field = serializers.BooleanField()
+
+    def parse(self, params, name, field):
+        try:
+            return field.run_validation(params[name])
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({name: e.detail})
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if 'min_price' in params:
+            queryset = queryset.filter(price__gte=self.parse(params, 'min_price', self.price_field))
+        if 'max_price' in params:
+            queryset = queryset.filter(price__lte=self.parse(params, 'max_price', self.price_field))
+        if 'owner' in params:
+            queryset = queryset.filter(owner_id=self.parse(params, 'owner', self.owner_field))
+        if 'mine' in params and self.parse(params, 'mine', self.mine_field):
+            if not request.user or not request.user.is_authenticated:
+                raise NotAuthenticated()
+            queryset = queryset.filter(owner_id=request.user.id)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': 'min_price', 'required': False, 'in': 'query', 'schema': {'type': 'number'}},
+            {'name': 'max_price', 'required': False, 'in': 'query', 'schema': {'type': 'number'}},
+            {'name': 'owner', 'required': False, 'in': 'query', 'schema': {'type': 'integer'}},
+            {
+                'name': 'mine', 'required': False, 'in': 'query', 'schema': {'type': 'boolean'},
+                'description': "Only the authenticated user's products",
+            },
+        ]
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """
+    Whitelisted `?ordering=`, the primary key is appended in the same direction so that
+    every ordering is total and matches the composite (<field>, id) indexes.
+    search results keep their rank ordering unless an explicit ordering is asked for.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params
+        if self.ordering_param not in params and params.get(ProductSearchFilter.search_param, '').strip():
+            return None
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        if ordering[-1].lstrip('-') != 'id':
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
@@ -0,0 +1,113 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from product import cache
+
+
+class ConditionalMixin:
+    """
+    ETag / Last-Modified validators for product responses.
+    `If-None-Match` / `If-Modified-Since` answer safe requests with a 304,
+    `If-Match` / `If-Unmodified-Since` reject writes to a modified product with a 412.
+    """
+    # lists can lose rows without their newest row changing, so they are only validated by ETag:
+    honour_if_modified_since = True
+
+    def set_validators(self, response, etag, last_modified):
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def check_preconditions(self, request, etag, last_modified):
+        """
+        Return the 304/412 response if a precondition of the request short-circuits it, None otherwise.
+        """
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified if self.honour_if_modified_since else None
+        )
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def page_validators(self, request, objects, meta=None):
+        """
+        Validators of a list page computed from its rows and pagination metadata, no serialization needed.
+        """
+        digest = hashlib.md5(request.get_full_path().encode())
+        digest.update(repr(meta).encode())
+        for obj in objects:
+            digest.update(obj.etag.encode())
+        last_modified = max((obj.last_modified for obj in objects), default=None)
+        return f'"{digest.hexdigest()}"', last_modified
+
+
+class CachedReadMixin(ConditionalMixin):
+    """
+    Serve anonymous GET responses from the product response cache.
+    only the serialized payload and its validators are cached, content negotiation and rendering still run per request.
+    anonymous responses are public for PRODUCT_PROXY_CACHE_TIMEOUT seconds to shared caches, the others private.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user and request.user.is_authenticated:
+            response = handler(request, *args, **kwargs)
+        else:
+            key, cached = self.cache_lookup(request, kwargs.get('pk'))
+            if cached is not None:
+                response = self.cached_hit(request, cached)
+            else:
+                response = handler(request, *args, **kwargs)
+                self.cache_store(key, response)
+        return self.patch_caching(request, response)
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        if request.user and request.user.is_authenticated:
+            response = await handler(request, *args, **kwargs)
+        else:
+            # cache backends have no native async API yet, key and lookup share one trip to a worker thread:
+            key, cached = await sync_to_async(self.cache_lookup)(request, kwargs.get('pk'))
+            if cached is not None:
+                response = self.cached_hit(request, cached)
+            else:
+                response = await handler(request, *args, **kwargs)
+                await sync_to_async(self.cache_store)(key, response)
+        return self.patch_caching(request, response)
+
+    def patch_caching(self, request, response):
+        if request.user and request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        elif response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            # browsers revalidate with the ETag, shared caches reuse it for PRODUCT_PROXY_CACHE_TIMEOUT seconds:
+            patch_cache_control(response, public=True, max_age=0, s_maxage=settings.PRODUCT_PROXY_CACHE_TIMEOUT)
+        # the browsable API renders the same URL as HTML:
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+
+    def cache_lookup(self, request, pk):
+        key = cache.response_cache_key(request, pk=pk)
+        return key, cache.get_cached_response(key)
+
+    def cached_hit(self, request, cached):
+        etag, last_modified = cached['etag'], cached['last_modified']
+        not_modified = self.check_preconditions(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(Response(cached['data']), etag, last_modified)
+
+    def cache_store(self, key, response):
+        if response.status_code == status.HTTP_200_OK:
+            cache.set_cached_response(key, {
+                'data': response.data,
+                'etag': response.get('ETag'),
+                'last_modified': parse_http_date_safe(response.get('Last-Modified')),
+            })
@@ -0,0 +1,130 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+
+
+COUNT_QUERY_PARAM = 'count'
+APPROXIMATE_COUNT = 'approx'
+
+
+def approximate_count(queryset):
+    """
+    Estimate the number of rows of a queryset from postgres statistics instead of running COUNT(*).
+    unfiltered querysets read `pg_class.reltuples`, filtered ones use the planner's row estimate.
+    falls back to an exact count when the table has never been analyzed.
+    """
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else -1
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+
+    if estimate is None or estimate < 0:
+        return queryset.count()
+    return int(estimate)
+
+
+def wants_approximate_count(request):
+    return request.query_params.get(COUNT_QUERY_PARAM) == APPROXIMATE_COUNT
+
+
+class ApproximateCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator over a row count computed beforehand, e.g. through the async ORM.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+async def acount(queryset, request):
+    if wants_approximate_count(request):
+        return await sync_to_async(approximate_count)(queryset)
+    return await queryset.acount()
+
+
+class ProductPagination(PageNumberPagination):
+    """
+    Page number pagination, `?count=approx` replaces the exact COUNT(*) with an estimate.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if wants_approximate_count(request):
+            self.django_paginator_class = ApproximateCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset with the count and the rows of the page fetched through the async ORM.
+        """
+        self.request = request
+        paginator = CountedPaginator(queryset, self.get_page_size(request), count=await acount(queryset, request))
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.page.object_list = [obj async for obj in self.page.object_list.aiterator()]
+        return list(self.page)
+
+
+class ProductCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key, every page is served by an index range scan
+    and no COUNT(*) is executed unless `?count=approx` is requested.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 20
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = approximate_count(queryset) if wants_approximate_count(request) else None
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # DRF evaluates the keyset page inside paginate_queryset, it runs in a worker thread:
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {'count': self.count, **response.data}
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'count': {'type': 'integer', 'example': 123},
+            **response_schema['properties']
+        }
+        return response_schema
@@ -15,4 +15,4 @@ class IsAdminOrOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return request.user.is_staff or obj.owner == request.user
+        return request.user.is_staff or obj.owner_id == request.user.id
@@ -0,0 +1,92 @@
+"""
+Product representations built from values() rows, the same data as ProductCreateSerializer
+without model instances nor the per field serializer machinery.
+"""
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from product.models import ProductImage, product_etag
+from .serializers import ProductCreateSerializer
+
+
+class ProductRow(dict):
+    """
+    values() row of a product, with the validators and owner of a Product instance.
+    """
+
+    @property
+    def etag(self):
+        return product_etag(self['id'], self['updated_at'])
+
+    @property
+    def last_modified(self):
+        return int(self['updated_at'].timestamp())
+
+    @property
+    def owner_id(self):
+        return self['owner_id']
+
+
+@lru_cache(maxsize=None)
+def representation_fields():
+    """
+    `(name, column, to_representation)` of the fields ProductCreateSerializer outputs, in its order.
+    `to_representation` is None for the fields whose value is sent as read.
+    """
+    fields = []
+    for name, field in ProductCreateSerializer().fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            fields.append((name, f'{field.source}_id', None))
+        elif isinstance(field, (serializers.IntegerField, serializers.CharField)):
+            fields.append((name, field.source, None))
+        else:
+            fields.append((name, field.source, field.to_representation))
+    return tuple(fields)
+
+
+def product_rows(queryset):
+    """
+    `queryset` as values() rows of the columns of the representation.
+    """
+    columns = {column for name, column, _ in representation_fields() if name != 'images'} | {'updated_at'}
+    return queryset.values(*columns)
+
+
+def serialize_products(rows, request):
+    """
+    The representation of every row, with the images of all of them read in one query.
+    """
+    images = images_by_product([row['id'] for row in rows], request)
+    data = []
+    for row in rows:
+        item = {}
+        for name, column, to_representation in representation_fields():
+            if name == 'images':
+                item[name] = images.get(row['id'], [])
+                continue
+            value = row[column]
+            item[name] = value if to_representation is None or value is None else to_representation(value)
+        data.append(item)
+    return data
+
+
+def images_by_product(product_ids, request):
+    """
+    ProductImageSerializer data of the images of the products, grouped by product.
+    """
+    storage = ProductImage._meta.get_field('image').storage
+    absolute_url = request.build_absolute_uri
+    images = {}
+    for product_id, image_id, name, variants in ProductImage.objects.filter(product_id__in=product_ids).order_by(
+        'id'
+    ).values_list('product_id', 'id', 'image', 'variants'):
+        images.setdefault(product_id, []).append({
+            'id': image_id,
+            'image': absolute_url(storage.url(name)) if name else None,
+            'variants': {size: absolute_url(storage.url(path)) for size, path in variants.items()},
+        })
+    return images
+
@@ -1,6 +1,20 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
-from product.models import Product, ProductImage
+import os
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import get_available_image_extensions
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema_field
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from product.fields import lock_files
+from product.models import Product, ProductImage, ImageUpload, MediaDeletion
+from product.cache import invalidate_product
+from product.tasks import schedule_image_variants, schedule_media_sweep
+from product.uploads import claim_uploads, publish_uploads
 from decouple import config
 
 MAX_IMG_SIZE = config('MAX_IMG_SIZE', cast=int, default=2097152)
@@ -8,10 +22,21 @@ MAX_IMG_PER_PRODUCT = (config('MAX_ING_PER_PRODUCT', cast=int, default=5))
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'variants')
+
+    @extend_schema_field(serializers.DictField(child=serializers.URLField()))
+    def get_variants(self, obj):
+        request = self.context.get('request')
+        storage = obj.image.storage
+        urls = {}
+        for name, path in obj.variants.items():
+            url = storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+        return urls
 
 
 class ProductBaseSerializer(serializers.ModelSerializer):
@@ -21,10 +46,12 @@ class ProductBaseSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    # images uploaded ahead through the chunked upload api:
+    upload_tokens = serializers.ListField(child=serializers.UUIDField(), write_only=True, required=False)
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('search_vector',)
         extra_kwargs = {
             'owner': {'read_only': True}
         }
@@ -38,21 +65,171 @@ class ProductBaseSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(f"image {img} is over 2MB")
         return value
 
-    def create_images(self, product, new_images):
-        for img in new_images:
-            ProductImage.objects.create(product=product, image=img)
+    def validate_upload_tokens(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("an upload could be used only once")
+        return value
+
+    def validate(self, attrs):
+        validated_attrs = super().validate(attrs)
+        if self.images_count(validated_attrs) > MAX_IMG_PER_PRODUCT:
+            raise serializers.ValidationError(f"Only up to {MAX_IMG_PER_PRODUCT} image could post per product")
+        return validated_attrs
+
+    def images_count(self, attrs):
+        return len(attrs.get('new_images', [])) + len(attrs.get('upload_tokens', []))
+
+    def publish_uploads(self, upload_tokens):
+        """
+        Copy the uploaded images to the product storage before the transaction, which only claims the uploads.
+        """
+        if not upload_tokens:
+            return {}
+        return publish_uploads(self.context['request'].user, upload_tokens)
+
+    def collect_images(self, new_images, upload_tokens, published):
+        """
+        Files of the new images, uploaded images are claimed and referenced by their storage name.
+        """
+        new_images = list(new_images)
+        if upload_tokens:
+            uploaded = claim_uploads(self.context['request'].user, published)
+            missing = [str(token) for token in upload_tokens if token not in uploaded]
+            if missing:
+                raise serializers.ValidationError({
+                    'upload_tokens': [f"upload {token} is unknown or not complete" for token in missing]
+                })
+            new_images += [uploaded[token] for token in upload_tokens]
+        return new_images
+
+    def discard_stored(self, names):
+        """
+        Queue the files stored for a save which failed, they are deleted unless another image uses them.
+        """
+        if names:
+            MediaDeletion.objects.bulk_create([MediaDeletion(name=name) for name in names])
+            schedule_media_sweep()
+
+    def create_images(self, product, new_images, upload_tokens=(), published=None):
+        """
+        Reserve the image slots in one UPDATE and insert all images in one INSERT.
+        uploaded images are already in the storage, only their rows are written.
+        """
+        new_images = self.collect_images(new_images, upload_tokens, published or {})
+        if not new_images:
+            return []
+        try:
+            Product.reserve_image_slots(product.id, len(new_images))
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'new_images': e.messages})
+        images = self.insert_images(product, new_images)
+        invalidate_product(product.id)
+        return images
+
+    def insert_images(self, product, new_images):
+        # uploaded files are stored in one go, the other images are storage names already:
+        files = iter(ProductImage._meta.get_field('image').store_files([
+            (img.name, img) for img in new_images if not isinstance(img, str)
+        ]))
+        new_images = [img if isinstance(img, str) else next(files) for img in new_images]
+        images = ProductImage.objects.bulk_create([ProductImage(product=product, image=img) for img in new_images])
+        schedule_image_variants([image.id for image in images])
+        return images
 
 
 class ProductCreateSerializer(ProductBaseSerializer):
 
     def create(self, validated_data):
         new_images = validated_data.pop('new_images', [])
+        upload_tokens = validated_data.pop('upload_tokens', [])
         owner = self.context['request'].user
-        product = Product.objects.create(**validated_data, owner=owner)
-        self.create_images(product, new_images)
+        published = self.publish_uploads(upload_tokens)
+        try:
+            with transaction.atomic():
+                product = Product.objects.create(**validated_data, owner=owner)
+                self.create_images(product, new_images, upload_tokens, published)
+        except Exception:
+            self.discard_stored([name for _, name in published.values()])
+            raise
         return product
 
 
+class ProductListSerializer(serializers.ModelSerializer):
+    """
+    Compact list representation: `?fields=` picks the fields (id, title, price and thumbnail by default),
+    `?expand=images` adds the nested images. only the columns of the picked fields are selected,
+    `thumbnail` is the url of the first image's thumbnail, read from annotations of the product query.
+    """
+    thumbnail = serializers.SerializerMethodField()
+    images = ProductImageSerializer(many=True, read_only=True)
+
+    default_fields = ('id', 'title', 'price', 'thumbnail')
+    expandable_fields = ('images',)
+    # read by the page validators and the orderings, always selected:
+    required_columns = ('id', 'updated_at', 'price', 'created_at')
+
+    class Meta:
+        model = Product
+        exclude = ('search_vector',)
+
+    def __init__(self, *args, fields=default_fields, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+    @classmethod
+    def parse_fields(cls, query_params):
+        """
+        The fields asked for with `?fields=` / `?expand=`, None when neither is given (full representation).
+        """
+        if 'fields' not in query_params and 'expand' not in query_params:
+            return None
+        fields = [name for name in query_params.get('fields', '').split(',') if name] or list(cls.default_fields)
+        expand = [name for name in query_params.get('expand', '').split(',') if name]
+        available = set(cls().get_fields())
+        errors = {}
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            errors['fields'] = [f"unknown fields: {', '.join(unknown)}"]
+        unknown = [name for name in expand if name not in cls.expandable_fields]
+        if unknown:
+            errors['expand'] = [f"only {', '.join(cls.expandable_fields)} could be expanded"]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return list(dict.fromkeys(fields + expand))
+
+    @classmethod
+    def setup_queryset(cls, queryset, fields):
+        """
+        Restrict the product query to the columns of `fields`, with the thumbnail of each row annotated.
+        """
+        columns = {field.name for field in Product._meta.concrete_fields} & set(fields)
+        queryset = queryset.only(*cls.required_columns, *columns)
+        if 'thumbnail' in fields:
+            first_image = ProductImage.objects.filter(product=OuterRef('pk')).order_by('id')
+            queryset = queryset.annotate(
+                thumbnail_image=Subquery(first_image.values('image')[:1]),
+                thumbnail_variants=Subquery(first_image.values('variants')[:1]),
+            )
+        return queryset
+
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_thumbnail(self, obj):
+        if not obj.thumbnail_image:
+            return None
+        storage = ProductImage._meta.get_field('image').storage
+        variants = obj.thumbnail_variants or {}
+        url = storage.url(variants.get('thumbnail_webp', obj.thumbnail_image))
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class ProductConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The product was modified by another request, reload it and retry."
+    default_code = 'product_conflict'
+
+
 class ProductUpdateSerializer(ProductBaseSerializer):
     old_images_ids = serializers.ListField(
         child=serializers.IntegerField(),
@@ -60,30 +237,188 @@ class ProductUpdateSerializer(ProductBaseSerializer):
         required=True
     )
 
+    # product columns a PUT/PATCH changes, the others are read only or owned by the importer:
+    updatable_fields = ('title', 'price', 'description')
+
     def validate(self, attrs):
         validated_attrs = super().validate(attrs)
 
         if 'old_images_ids' not in validated_attrs:
+            # a PATCH without old_images_ids keeps the images:
+            if self.partial:
+                return validated_attrs
             raise serializers.ValidationError("old_images_ids field is required.")
-        new_images_count = len(validated_attrs.get('new_images', []))
-        if new_images_count + len(validated_attrs['old_images_ids']) > MAX_IMG_PER_PRODUCT:
+        if self.images_count(validated_attrs) + len(validated_attrs['old_images_ids']) > MAX_IMG_PER_PRODUCT:
             raise serializers.ValidationError(f"Only up to {MAX_IMG_PER_PRODUCT} image could post per product")
         return validated_attrs
 
     def update(self, instance, validated_data):
-        old_imgs_ids = validated_data.pop('old_images_ids', [])
-        instance_images_ids = instance.images.values_list('id', flat=True)
-        removed_ids = [i for i in list(instance_images_ids) if i not in old_imgs_ids]
-        # remove old images that are deleted by client :
-        instance.images.filter(id__in=removed_ids).delete()
-        # Set new values if provided:
-        instance.title = validated_data.get('title', instance.title)
-        instance.price = validated_data.get('price', instance.price)
-        instance.description = validated_data.get('description', instance.description)
+        """
+        Reconcile the images of the product with set operations, in a fixed number of queries whatever the image
+        count: one DELETE of the images not kept, one UPDATE of the changed columns and one INSERT of the new images.
+        the UPDATE is a compare-and-set on the version `instance` was read at, ProductConflict is raised if the
+        product changed meanwhile. new files are stored before the transaction, which only writes rows.
+        """
+        changed = [
+            field for field in self.updatable_fields
+            if field in validated_data and getattr(instance, field) != validated_data[field]
+        ]
+        stored = self.store_images(validated_data.get('new_images', []))
+        published = self.publish_uploads(validated_data.get('upload_tokens', []))
+        try:
+            return self.reconcile(instance, validated_data, changed, stored, published)
+        except Exception:
+            self.discard_stored(stored + [name for _, name in published.values()])
+            raise
+
+    def reconcile(self, instance, validated_data, changed, new_images, published):
+        with transaction.atomic():
+            removed = 0
+            if 'old_images_ids' in validated_data:
+                # skips the per image signals: the delete trigger queues the files and image_count is written below
+                kept = set(validated_data['old_images_ids'])
+                removed = instance.images.exclude(id__in=kept)._raw_delete(instance._state.db)
+                if removed:
+                    schedule_media_sweep()
 
-        instance.save()
+            new_images = self.keep_stored_images(new_images, validated_data.get('new_images', []))
+            new_images = self.collect_images(new_images, validated_data.get('upload_tokens', []), published)
+            # exact as long as the version did not change, which the UPDATE below checks:
+            image_count = instance.image_count - removed + len(new_images)
+            if image_count > MAX_IMG_PER_PRODUCT:
+                raise serializers.ValidationError({
+                    'new_images': [f"Max image count for product is {MAX_IMG_PER_PRODUCT}"]
+                })
 
-        # Add new images:
-        self.create_images(instance, validated_data.get('new_images', []))
+            values = {field: validated_data[field] for field in changed}
+            if removed or new_images:
+                values['image_count'] = image_count
+            if not values:
+                return instance
+            values['updated_at'] = timezone.now()
+            updated = Product.objects.filter(id=instance.id, version=instance.version).update(
+                **values, version=F('version') + 1
+            )
+            if not updated:
+                raise ProductConflict()
+            if new_images:
+                self.insert_images(instance, new_images)
 
+        for field, value in values.items():
+            setattr(instance, field, value)
+        instance.version += 1
+        invalidate_product(instance.id)
         return instance
+
+    def store_images(self, new_images):
+        """
+        Write the uploaded files to the storage, returns their names.
+        """
+        return ProductImage._meta.get_field('image').store_files([(img.name, img) for img in new_images])
+
+    def keep_stored_images(self, names, new_images):
+        """
+        Lock the files stored before the transaction until their rows are written, returns their names.
+        a file shared with an image deleted meanwhile may have been swept already, it is stored again.
+        """
+        field = ProductImage._meta.get_field('image')
+        lock_files(names)
+        kept = []
+        for name, img in zip(names, new_images):
+            if not field.storage.exists(name):
+                img.seek(0)
+                name = field.storage.save(name, img, max_length=field.max_length)
+            kept.append(name)
+        return kept
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ImageUpload
+        fields = ('token', 'filename', 'size', 'offset', 'complete')
+        read_only_fields = ('token',)
+
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        extension = os.path.splitext(value)[1].lstrip('.').lower()
+        if extension not in get_available_image_extensions():
+            raise serializers.ValidationError(f"{value} is not an image file name")
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= MAX_IMG_SIZE:
+            raise serializers.ValidationError(f"image size should be between 1 byte and {MAX_IMG_SIZE} bytes")
+        return value
+
+
+class ProductBulkItemSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Product
+        fields = ('sku', 'title', 'price', 'description')
+        extra_kwargs = {
+            # checked for the whole batch in one query by ProductBulkCreateSerializer:
+            'sku': {'validators': []}
+        }
+
+    def validate_sku(self, value):
+        return value or None
+
+
+class ProductBulkCreateSerializer(serializers.Serializer):
+    """
+    Validate every product of a bulk request on its own so errors can be reported per item.
+    """
+    products = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_products(self, value):
+        max_items = settings.BULK_CREATE_MAX_ITEMS
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"Only up to {max_items} products could be created per request")
+        return value
+
+    def validate(self, attrs):
+        self.item_serializers = [ProductBulkItemSerializer(data=item) for item in attrs['products']]
+        self.results = []
+        for index, item_serializer in enumerate(self.item_serializers):
+            if item_serializer.is_valid():
+                self.results.append({'index': index, 'status': 'valid'})
+            else:
+                self.results.append({'index': index, 'status': 'invalid', 'errors': item_serializer.errors})
+
+        self.validate_skus()
+
+        if any(result['status'] == 'invalid' for result in self.results):
+            raise serializers.ValidationError({'results': self.results})
+        return attrs
+
+    def validate_skus(self):
+        skus = {
+            index: item.validated_data['sku'] for index, item in enumerate(self.item_serializers)
+            if self.results[index]['status'] == 'valid' and item.validated_data.get('sku')
+        }
+        if not skus:
+            return
+        taken = set(Product.objects.filter(sku__in=skus.values()).values_list('sku', flat=True))
+        seen = set()
+        for index, sku in skus.items():
+            result = self.results[index]
+            if sku in taken or sku in seen:
+                result.update(status='invalid', errors={'sku': ["product with this sku already exists."]})
+            seen.add(sku)
+
+    def create(self, validated_data):
+        owner = self.context['request'].user
+        products = Product.objects.bulk_create(
+            [Product(**item.validated_data, owner=owner) for item in self.item_serializers],
+            batch_size=settings.BULK_CREATE_BATCH_SIZE
+        )
+        invalidate_product(None)
+        self.results = [
+            {'index': index, 'status': 'created', 'id': product.id}
+            for index, product in enumerate(products)
+        ]
+        return products
@@ -1,8 +1,16 @@
-from django.urls import path
-from .views import ProductListCreateApiView, ProductRetrieveUpdateDestroyApiView
+from django.urls import path, re_path
+from .views import (
+    ProductListCreateApiView, ProductRetrieveUpdateDestroyApiView, ProductBulkCreateApiView, ProductExportApiView,
+    ImageUploadCreateApiView, ImageUploadApiView, ImageUploadImageApiView
+)
 
 urlpatterns = [
     path('', ProductListCreateApiView.as_view(), name='product_list_create'),
     path('<int:pk>', ProductRetrieveUpdateDestroyApiView.as_view(), name='product_detail'),
+    path('bulk', ProductBulkCreateApiView.as_view(), name='product_bulk_create'),
+    path('uploads', ImageUploadCreateApiView.as_view(), name='image_upload_create'),
+    path('uploads/<uuid:token>', ImageUploadApiView.as_view(), name='image_upload'),
+    path('uploads/<uuid:token>/image', ImageUploadImageApiView.as_view(), name='image_upload_image'),
+    re_path(r'^export\.(?P<export_format>ndjson|csv)$', ProductExportApiView.as_view(), name='product_export'),
 ]
 
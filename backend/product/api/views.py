@@ -1,36 +1,125 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from drf_spectacular.utils import extend_schema
+from django.db.models import prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
+from django.conf import settings
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.parsers import MultiPartParser, FormParser, FileUploadParser
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser, FileUploadParser
 
-from .serializers import ProductCreateSerializer, ProductUpdateSerializer
-from product.models import Product
+from .serializers import (
+    ProductCreateSerializer, ProductUpdateSerializer, ProductBulkCreateSerializer, ImageUploadSerializer,
+    ProductListSerializer, ProductConflict
+)
+from .pagination import ProductPagination, ProductCursorPagination
+from .rows import ProductRow, product_rows, serialize_products
+from core.storage import media_response
+from core.views import AsyncAPIView
+from product.models import Product, ImageUpload
+from product.uploads import (
+    InvalidChunk, OffsetMismatch, complete_upload, discard_upload, parse_content_range, write_chunk
+)
+from product.export import aiter_chunks, iter_export, CONTENT_TYPES
 from .permissions import IsAdminOrOwnerOrReadOnly
+from .mixins import CachedReadMixin
+from .filters import ProductSearchFilter, ProductFilter, ProductOrderingFilter
 
 
-class ProductListCreateApiView(generics.ListCreateAPIView):
+class ProductListCreateApiView(CachedReadMixin, AsyncAPIView, generics.ListCreateAPIView):
     """
     API view to retrieve list of products or create a new product.
     required authentication for product creation
     use transaction to save product and its related images
+    list is page-number paginated by default, `?pagination=cursor` switches to keyset pagination
+    `?q=` searches title and description, results are ranked unless cursor pagination is used
+    filters: `min_price`, `max_price`, `owner`, `mine`; `?ordering=` one of price, created_at, id (`-` for desc)
+    `?fields=` / `?expand=images` switch to the compact representation of ProductListSerializer
     """
 
-    class ProductPagination(PageNumberPagination):
-        page_size = 20
-        page_size_query_param = 'page_size'
-        max_page_size = 20
-
     serializer_class = ProductCreateSerializer
+    honour_if_modified_since = False
     pagination_class = ProductPagination
+    cursor_pagination_class = ProductCursorPagination
+    filter_backends = [ProductFilter, ProductSearchFilter, ProductOrderingFilter]
+    ordering_fields = ('price', 'created_at', 'id')
+    ordering = ('-id',)
     permission_classes = [IsAuthenticatedOrReadOnly]
-    parser_classes = [MultiPartParser, FormParser]
+    # images are sent as files, or uploaded ahead and referenced by their `upload_tokens`:
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = getattr(self.request, 'query_params', {})
+            if params.get('pagination') == 'cursor' or self.cursor_pagination_class.cursor_query_param in params:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_queryset(self):
-        return Product.objects.prefetch_related('images')
+        # images are prefetched once the page is known to be sent, see conditional_list
+        return Product.objects.all()
+
+    @extend_schema(parameters=[
+        OpenApiParameter('fields', description="Comma separated fields of the compact representation"),
+        OpenApiParameter('expand', description="`images` adds the nested images to the compact representation"),
+    ])
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(self.conditional_list, request, *args, **kwargs)
+
+    async def aget(self, request, *args, **kwargs):
+        return await self.acached_response(self.aconditional_list, request, *args, **kwargs)
+
+    def conditional_list(self, request, *args, **kwargs):
+        queryset, fields, fast = self.list_queryset(request)
+        objects = self.paginator.paginate_queryset(queryset, request, view=self)
+        return self.list_response(request, objects, fields, fast)
+
+    async def aconditional_list(self, request, *args, **kwargs):
+        queryset, fields, fast = self.list_queryset(request)
+        objects = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        # no async prefetch_related_objects before Django 5.0, the page is serialized in a worker thread:
+        return await sync_to_async(self.list_response)(request, objects, fields, fast)
+
+    def list_queryset(self, request):
+        fields = ProductListSerializer.parse_fields(request.query_params)
+        fast = fields is None and settings.PRODUCT_FAST_READS
+        queryset = self.filter_queryset(self.get_queryset())
+        if fields is not None:
+            queryset = ProductListSerializer.setup_queryset(queryset, fields)
+        elif fast:
+            queryset = product_rows(queryset)
+        return queryset, fields, fast
+
+    def list_response(self, request, objects, fields, fast):
+        if fast:
+            objects = [ProductRow(row) for row in objects]
+        meta = self.paginator.get_paginated_response([]).data
+
+        etag, last_modified = self.page_validators(request, objects, meta)
+        not_modified = self.check_preconditions(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if fast:
+            # images of the page in one query, no model instances nor serializers:
+            response = self.get_paginated_response(serialize_products(objects, request))
+            return self.set_validators(response, etag, last_modified)
+        if fields is None or 'images' in fields:
+            prefetch_related_objects(objects, 'images')
+        if fields is None:
+            serializer = self.get_serializer(objects, many=True)
+        else:
+            serializer = ProductListSerializer(objects, many=True, fields=fields, context=self.get_serializer_context())
+        response = self.get_paginated_response(serializer.data)
+        return self.set_validators(response, etag, last_modified)
 
     @extend_schema(
         request=ProductCreateSerializer,
@@ -42,8 +131,10 @@ class ProductListCreateApiView(generics.ListCreateAPIView):
         ser_data.is_valid(raise_exception=True)
 
         try:
-            with transaction.atomic():
-                ser_data.save()
+            # uploaded images are copied before the transaction the serializer saves the product in:
+            ser_data.save()
+        except ValidationError:
+            raise
         except Exception as e:
             return Response(
                 {'msg': 'Failed to save data', 'error': str(e)},
@@ -53,7 +144,7 @@ class ProductListCreateApiView(generics.ListCreateAPIView):
         return Response(ser_data.data, status=status.HTTP_201_CREATED)
 
 
-class ProductRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView):
+class ProductRetrieveUpdateDestroyApiView(CachedReadMixin, AsyncAPIView, generics.RetrieveUpdateDestroyAPIView):
     """
         API view to retrieve-update-destroy A product.
         required authentication for product update / delete
@@ -62,11 +153,12 @@ class ProductRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView)
 
     serializer_class = ProductUpdateSerializer
     permission_classes = [IsAdminOrOwnerOrReadOnly]
-    parser_classes = [FormParser, MultiPartParser, FileUploadParser]
+    # FileUploadParser accepts any content type, it comes last:
+    parser_classes = [JSONParser, FormParser, MultiPartParser, FileUploadParser]
 
     def get_object(self):
         pk = self.kwargs['pk']
-        if self.request.method in ['PUT', 'PATCH']:  # Only apply select_for_update() for update methods
+        if self.request.method in ['PUT', 'PATCH'] and settings.PRODUCT_UPDATE_LOCKING == 'pessimistic':
             product = get_object_or_404(Product.objects.select_for_update(), id=pk)
         else:
             product = get_object_or_404(Product, id=pk)
@@ -74,17 +166,206 @@ class ProductRetrieveUpdateDestroyApiView(generics.RetrieveUpdateDestroyAPIView)
         self.check_object_permissions(self.request, product)
         return product
 
+    def check_product_preconditions(self, request, product):
+        return self.check_preconditions(request, product.etag, product.last_modified)
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(self.conditional_retrieve, request, *args, **kwargs)
+
+    async def aget(self, request, *args, **kwargs):
+        return await self.acached_response(self.aconditional_retrieve, request, *args, **kwargs)
+
+    def conditional_retrieve(self, request, *args, **kwargs):
+        if settings.PRODUCT_FAST_READS:
+            product = product_rows(Product.objects.filter(id=self.kwargs['pk'])).first()
+        else:
+            product = Product.objects.filter(id=self.kwargs['pk']).first()
+        return self.retrieve_response(request, product)
+
+    async def aconditional_retrieve(self, request, *args, **kwargs):
+        if settings.PRODUCT_FAST_READS:
+            product = await product_rows(Product.objects.filter(id=self.kwargs['pk'])).afirst()
+        else:
+            product = await Product.objects.filter(id=self.kwargs['pk']).afirst()
+        # no async prefetch_related_objects before Django 5.0, the product is serialized in a worker thread:
+        return await sync_to_async(self.retrieve_response)(request, product)
+
+    def retrieve_response(self, request, product):
+        if product is None:
+            raise Http404
+        fast = settings.PRODUCT_FAST_READS
+        if fast:
+            product = ProductRow(product)
+        self.check_object_permissions(request, product)
+        not_modified = self.check_product_preconditions(request, product)
+        if not_modified is not None:
+            return not_modified
+
+        if fast:
+            [data] = serialize_products([product], request)
+            return self.set_validators(Response(data), product.etag, product.last_modified)
+        prefetch_related_objects([product], 'images')
+        serializer = self.get_serializer(product)
+        return self.set_validators(Response(serializer.data), product.etag, product.last_modified)
+
     @extend_schema(
         request=ProductUpdateSerializer,
         responses={200: ProductUpdateSerializer()}
     )
-    @transaction.atomic()
     def update(self, request, *args, **kwargs):
+        if settings.PRODUCT_UPDATE_LOCKING == 'pessimistic':
+            # the product row stays locked from the read to the commit:
+            with transaction.atomic():
+                return self.update_product(request, *args, **kwargs)
+        # the product is read without lock, the serializer's compare-and-set UPDATE detects concurrent writes:
+        return self.update_product(request, *args, **kwargs)
+
+    def update_product(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         product = self.get_object()
-        serializer = self.serializer_class(product, data=request.data, partial=partial)
+        precondition_failed = self.check_product_preconditions(request, product)
+        if precondition_failed is not None:
+            return precondition_failed
+        serializer = self.serializer_class(
+            product, data=request.data, partial=partial, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            serializer.save()
+        except ProductConflict:
+            # the validators the client sent were current when checked, not anymore:
+            if 'If-Match' in request.headers or 'If-Unmodified-Since' in request.headers:
+                return Response(
+                    {'detail': "The product was modified by another request."},
+                    status=status.HTTP_412_PRECONDITION_FAILED
+                )
+            raise
+
+        return self.set_validators(Response(serializer.data), product.etag, product.last_modified)
+
+    def destroy(self, request, *args, **kwargs):
+        product = self.get_object()
+        precondition_failed = self.check_product_preconditions(request, product)
+        if precondition_failed is not None:
+            return precondition_failed
+        self.perform_destroy(product)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ImageUploadCreateApiView(generics.CreateAPIView):
+    """
+    API view to start a chunked image upload, returns the token product create/update reference the image with.
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class ImageUploadApiView(generics.RetrieveDestroyAPIView):
+    """
+    API view to send the chunks of an upload, check how far it got or cancel it.
+    PATCH the raw bytes with `Content-Range: bytes <first>-<last>/<size>`, starting at the current `offset`.
+    chunks are written to a staging file outside of any transaction, an interrupted upload is resumed
+    from the `offset` GET reports. the last chunk moves the verified image to the media storage.
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'token'
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(owner=self.request.user)
+
+    @extend_schema(
+        request={'application/offset+octet-stream': OpenApiTypes.BINARY},
+        parameters=[OpenApiParameter('Content-Range', location=OpenApiParameter.HEADER, required=True)],
+        responses={200: ImageUploadSerializer()}
+    )
+    def patch(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            if upload.complete:
+                raise OffsetMismatch(upload.size)
+            first, last = parse_content_range(request.headers.get('Content-Range'), upload.size)
+            # the body is never parsed, it is copied from the request stream:
+            if request.stream is None:
+                raise InvalidChunk("chunk is empty")
+            write_chunk(upload, first, last, request.stream)
+            if upload.received == upload.size:
+                complete_upload(upload)
+        except OffsetMismatch as e:
+            return Response({'msg': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+        except InvalidChunk as e:
+            return Response({'msg': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
+
+    def perform_destroy(self, instance):
+        discard_upload(instance)
+
+
+class ImageUploadImageApiView(generics.GenericAPIView):
+    """
+    API view sending the image of a completed upload to its owner, e.g. to preview it before it's used.
+    behind nginx the file is streamed by nginx from its internal media location (X-Accel-Redirect).
+    """
+
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'token'
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(owner=self.request.user).exclude(image='')
+
+    def perform_content_negotiation(self, request, force=False):
+        # the image is not rendered, `Accept: image/png` must not end in a 406:
+        return super().perform_content_negotiation(request, force=True)
+
+    @extend_schema(responses={(200, 'image/*'): OpenApiTypes.BINARY})
+    def get(self, request, *args, **kwargs):
+        return media_response(self.get_object().image.name)
+
+
+class ProductBulkCreateApiView(generics.GenericAPIView):
+    """
+    API view to create many products in one request.
+    every product is validated on its own, nothing is saved unless all of them are valid,
+    valid products are inserted with bulk_create inside a single transaction
+    """
+
+    serializer_class = ProductBulkCreateSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+
+        return Response({'results': serializer.results}, status=status.HTTP_201_CREATED)
+
+
+class ProductExportApiView(generics.GenericAPIView):
+    """
+    API view to stream the whole catalog as NDJSON (`export.ndjson`) or CSV (`export.csv`).
+    accepts the filters of the product list, rows are streamed in id order from a server-side cursor
+    """
+
+    queryset = Product.objects.all()
+    filter_backends = [ProductFilter]
+    permission_classes = [IsAuthenticatedOrReadOnly]
 
-        return Response(serializer.data)
+    @extend_schema(responses={(200, 'application/x-ndjson'): str, (200, 'text/csv'): str})
+    def get(self, request, export_format, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        content = iter_export(export_format, queryset, request.build_absolute_uri, settings.EXPORT_CHUNK_SIZE)
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_chunks(content, settings.EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(content, content_type=f"{CONTENT_TYPES[export_format]}; charset=utf-8")
+        response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+        return response
@@ -0,0 +1,90 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from prometheus_client import Counter
+
+
+LIST_GENERATION_KEY = 'products:list:generation'
+DETAIL_GENERATION_KEY = 'products:detail:{pk}:generation'
+
+
+# prometheus_client keeps them per worker in PROMETHEUS_MULTIPROC_DIR, metrics_view sums them over the workers:
+CACHE_HITS = Counter('product_response_cache_hits', 'Product responses served from cache')
+CACHE_MISSES = Counter('product_response_cache_misses', 'Product responses missing from cache')
+
+
+def _new_generation():
+    # larger than any generation handed out before, entries cached under an evicted generation never come back:
+    return time.time_ns()
+
+
+def _generation(key):
+    return cache.get_or_set(key, _new_generation, timeout=None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:  # key is missing or was evicted
+        cache.set(key, _new_generation(), timeout=None)
+
+
+def response_cache_key(request, pk=None):
+    """
+    Build the cache key of a GET response from its path and query params.
+    the key embeds the current list/detail generation so bumping it drops every related entry at once.
+    """
+    if pk is None:
+        generation = _generation(LIST_GENERATION_KEY)
+    else:
+        generation = _generation(DETAIL_GENERATION_KEY.format(pk=pk))
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    return f"products:response:{generation}:{digest}"
+
+
+def get_cached_response(key):
+    data = cache.get(key)
+    if data is None:
+        CACHE_MISSES.inc()
+    else:
+        CACHE_HITS.inc()
+    return data
+
+
+def set_cached_response(key, data):
+    cache.set(key, data, timeout=settings.PRODUCT_CACHE_TIMEOUT)
+
+
+def _invalidate(product_id):
+    _bump(LIST_GENERATION_KEY)
+    if product_id is not None:
+        _bump(DETAIL_GENERATION_KEY.format(pk=product_id))
+
+
+def invalidate_product(product_id):
+    """
+    Drop cached list pages and the detail of the given product.
+    runs now and once more after commit, so a read racing the open transaction can not keep stale data.
+    """
+    _invalidate(product_id)
+    transaction.on_commit(lambda: _invalidate(product_id))
+
+
+def _invalidate_many(product_ids):
+    _bump(LIST_GENERATION_KEY)
+    # a new generation shared by all the details, in one round trip:
+    generation = _new_generation()
+    cache.set_many({DETAIL_GENERATION_KEY.format(pk=pk): generation for pk in product_ids}, timeout=None)
+
+
+def invalidate_products(product_ids):
+    """
+    `invalidate_product` of a batch write, the list generation is bumped once for all the products.
+    """
+    _invalidate_many(product_ids)
+    transaction.on_commit(lambda: _invalidate_many(product_ids))
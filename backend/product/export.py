@@ -0,0 +1,81 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+
+from .models import Product, ProductImage
+
+
+EXPORT_FIELDS = ('id', 'title', 'price', 'description', 'owner', 'created_at', 'updated_at')
+EXPORT_FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_queryset(queryset=None):
+    if queryset is None:
+        queryset = Product.objects.all()
+    images = ProductImage.objects.only('id', 'product_id', 'image').order_by('id')
+    return queryset.only(*EXPORT_FIELDS).order_by('id').prefetch_related(Prefetch('images', queryset=images))
+
+
+def iter_records(queryset, build_url, chunk_size):
+    """
+    Yield one plain dict per product, rows are read through a server-side cursor `chunk_size` at a time
+    and images are prefetched per chunk, so memory use doesn't depend on the catalog size.
+    """
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': product.id,
+            'title': product.title,
+            'price': str(product.price),
+            'description': product.description,
+            'owner': product.owner_id,
+            'created_at': product.created_at.isoformat(),
+            'updated_at': product.updated_at.isoformat(),
+            'images': [build_url(img.image.url) for img in product.images.all()],
+        }
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """
+    File-like object whose write returns the value instead of buffering it, feeds csv.writer into a generator.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS + ('images',))
+    for record in records:
+        yield writer.writerow([record[field] for field in EXPORT_FIELDS] + ['|'.join(record['images'])])
+
+
+def iter_export(export_format, queryset, build_url, chunk_size):
+    records = iter_records(export_queryset(queryset), build_url, chunk_size)
+    if export_format == 'csv':
+        return iter_csv(records)
+    return iter_ndjson(records)
+
+
+async def aiter_chunks(content, chunk_size):
+    """
+    Async iterator over the sync `content`, `chunk_size` items are read per sync_to_async call and sent as one.
+    under ASGI a StreamingHttpResponse reads a sync iterator whole with sync_to_async(list) before sending it.
+    """
+    content = iter(content)
+    # thread sensitive: every chunk is read in the thread, and with the connection, holding the cursor
+    next_chunk = sync_to_async(lambda: ''.join(islice(content, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
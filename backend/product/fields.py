@@ -0,0 +1,65 @@
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models.fields.files import ImageFieldFile
+
+from .utils import content_hash_filename
+
+
+# first key of the advisory locks taken on stored file names, the second one is the hash of the name:
+FILE_LOCK_CLASS = 17
+
+
+def lock_files(names, shared=True, using=DEFAULT_DB_ALIAS):
+    """
+    Lock the stored files `names` until the end of the current transaction.
+    rows referencing a file are written under a shared lock, the sweeper deletes files no row references under an
+    exclusive one: a file is either deleted before the row is written, and stored again, or kept for it.
+    """
+    if not names:
+        return
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connections[using].cursor() as cursor:
+        # always in the same order, two transactions locking several names can't deadlock:
+        cursor.execute(
+            f"SELECT {function}(%s, hashtext(name)) FROM (SELECT DISTINCT unnest(%s::text[]) AS name ORDER BY 1) names",
+            [FILE_LOCK_CLASS, list(names)]
+        )
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+
+    def save(self, name, content, save=True):
+        self.name, = self.field.store_files([(name, content)], self.instance)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+
+class ContentAddressedImageField(models.ImageField):
+    """
+    ImageField storing files under the sha256 of their content, see `content_hash_filename`.
+    identical uploads share one file, it must only be deleted when no row references its name anymore.
+    files stored outside of the transaction writing their row must be locked again in it, see `lock_files`.
+    """
+    attr_class = ContentAddressedFieldFile
+
+    def store_files(self, files, instance=None):
+        """
+        Store the `(name, content)` pairs under their content names, locked in one query, returns the stored names.
+        the lock lasts until the rows are written when stored in their transaction.
+        """
+        if not files:
+            return []
+        names = [self.generate_filename(instance, content_hash_filename(name, content)) for name, content in files]
+        using = router.db_for_write(self.model, instance=instance)
+        with transaction.atomic(using=using, savepoint=False):
+            lock_files(names, using=using)
+            stored = []
+            for name, (_, content) in zip(names, files):
+                # the same bytes are stored already, the file is shared:
+                if not self.storage.exists(name):
+                    name = self.storage.save(name, content, max_length=self.max_length)
+                stored.append(name)
+        return stored
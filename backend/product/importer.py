@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.core.files import File
+from django.db import connection, transaction
+
+from .cache import invalidate_products
+from .models import Product, ProductImage, MAX_IMG_SIZE, MAX_IMG_PER_PRODUCT
+from .tasks import schedule_image_variants
+
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+MAX_PRICE = Decimal(10) ** 10  # DecimalField(max_digits=12, decimal_places=2)
+STAGING_COLUMNS = ('sku', 'title', 'price', 'description', 'image_count')
+# image files kept open at once while attaching them:
+IMAGE_BATCH_SIZE = 100
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(file, import_format):
+    """
+    Stream `(row number, dict)` pairs from a CSV (with header) or NDJSON file.
+    CSV image lists are `|` separated file names.
+    """
+    if import_format == 'csv':
+        for number, row in enumerate(csv.DictReader(file), start=1):
+            row['images'] = [name for name in (row.get('images') or '').split('|') if name]
+            yield number, row
+    else:
+        number = 0
+        for line in file:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, RowError(f"invalid json: {e}")
+
+
+def clean_row(row, images_dir):
+    """
+    Validate and normalize one input row, raises RowError with the reason it is rejected.
+    """
+    if isinstance(row, RowError):
+        raise row
+    sku = str(row.get('sku') or '').strip()
+    title = str(row.get('title') or '').strip()
+    description = str(row.get('description') or '').strip()
+    if not sku or len(sku) > 64:
+        raise RowError("sku is required and could be up to 64 characters")
+    if not title or len(title) > 255:
+        raise RowError("title is required and could be up to 255 characters")
+    if not description:
+        raise RowError("description is required")
+    try:
+        price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise RowError(f"invalid price {row.get('price')!r}")
+    if not price.is_finite() or abs(price) >= MAX_PRICE:
+        raise RowError(f"invalid price {row.get('price')!r}")
+
+    images = row.get('images') or []
+    if images and images_dir is None:
+        raise RowError("row has images but no images directory was given")
+    if len(images) > MAX_IMG_PER_PRODUCT:
+        raise RowError(f"Only up to {MAX_IMG_PER_PRODUCT} image could be attached per product")
+    image_paths = []
+    for name in images:
+        path = os.path.realpath(os.path.join(images_dir, name))
+        if not path.startswith(os.path.realpath(images_dir) + os.sep) or not os.path.isfile(path):
+            raise RowError(f"image {name} not found")
+        if os.path.getsize(path) > MAX_IMG_SIZE:
+            raise RowError(f"image {name} is over {MAX_IMG_SIZE} bytes")
+        image_paths.append(path)
+
+    return {'sku': sku, 'title': title, 'price': price, 'description': description, 'images': image_paths}
+
+
+def validate_batch(rows, images_dir):
+    """
+    Clean a batch of rows, returns `(valid rows, [(row number, error)])`.
+    a sku repeated inside the batch keeps its last row, an upsert can not touch one row twice.
+    """
+    valid, errors = {}, []
+    for number, row in rows:
+        try:
+            cleaned = clean_row(row, images_dir)
+        except RowError as e:
+            errors.append((number, str(e)))
+            continue
+        valid.pop(cleaned['sku'], None)
+        valid[cleaned['sku']] = cleaned
+    return list(valid.values()), errors
+
+
+def copy_to_staging(cursor, rows):
+    """
+    Load the batch into a temporary staging table with a single COPY.
+    """
+    cursor.execute(
+        "CREATE TEMP TABLE product_import_staging ("
+        "sku varchar(64) NOT NULL, title varchar(255) NOT NULL, price numeric(12, 2) NOT NULL, "
+        "description text NOT NULL, image_count smallint NOT NULL"
+        ") ON COMMIT DROP"
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['sku'], row['title'], row['price'], row['description'], len(row['images'])])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY product_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+UPSERT_SQL = """
+INSERT INTO {table} (sku, title, price, description, owner_id, image_count, version, created_at, updated_at)
+SELECT sku, title, price, description, %s, image_count, 1, now(), now() FROM product_import_staging
+ON CONFLICT (sku) DO UPDATE SET
+    title = EXCLUDED.title,
+    price = EXCLUDED.price,
+    description = EXCLUDED.description,
+    version = {table}.version + 1,
+    updated_at = EXCLUDED.updated_at
+WHERE ({table}.title, {table}.price, {table}.description)
+    IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.price, EXCLUDED.description)
+RETURNING id, sku, (xmax = 0) AS inserted
+"""
+
+
+def import_batch(rows, owner_id=None):
+    """
+    COPY a validated batch into staging and upsert it into the product table by sku, in one transaction.
+    images are only attached to newly inserted products. returns `(created, updated)` counts,
+    rows whose content didn't change are left untouched.
+    """
+    if not rows:
+        return 0, 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        copy_to_staging(cursor, rows)
+        cursor.execute(UPSERT_SQL.format(table=Product._meta.db_table), [owner_id])
+        upserted = cursor.fetchall()
+        # ON COMMIT DROP doesn't fire when the import runs inside an outer transaction:
+        cursor.execute("DROP TABLE product_import_staging")
+
+        images_by_sku = {row['sku']: row['images'] for row in rows}
+        new_images = []
+        for product_id, sku, inserted in upserted:
+            if inserted:
+                new_images += [(product_id, path) for path in images_by_sku[sku]]
+        created_images = attach_images(new_images)
+
+        # the details of new products were never cached:
+        invalidate_products([product_id for product_id, _, inserted in upserted if not inserted])
+        schedule_image_variants([image.id for image in created_images])
+
+    created = sum(1 for _, _, inserted in upserted if inserted)
+    return created, len(upserted) - created
+
+
+def attach_images(new_images):
+    """
+    Insert the images of new products with bulk_create, their slots were counted by the upsert.
+    """
+    created = []
+    for start in range(0, len(new_images), IMAGE_BATCH_SIZE):
+        files, images = [], []
+        try:
+            for product_id, path in new_images[start:start + IMAGE_BATCH_SIZE]:
+                file = open(path, 'rb')
+                files.append(file)
+                images.append(ProductImage(product_id=product_id, image=File(file, name=os.path.basename(path))))
+            created += ProductImage.objects.bulk_create(images)
+        finally:
+            for file in files:
+                file.close()
+    return created
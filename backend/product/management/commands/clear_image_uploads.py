@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from product.uploads import discard_upload, expired_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked image uploads older than IMAGE_UPLOAD_EXPIRY which no product referenced"
+
+    def handle(self, *args, **options):
+        removed = 0
+        for upload in expired_uploads().iterator():
+            discard_upload(upload)
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f"removed {removed} uploads"))
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product.fields import lock_files
+from product.models import ImageUpload, ProductImage
+from product.utils import content_hash_filename
+
+
+class Command(BaseCommand):
+    help = "Rename product images to their content hash, identical files are merged into one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="only report the space that would be reclaimed")
+
+    def handle(self, *args, **options):
+        field = ProductImage._meta.get_field('image')
+        storage = field.storage
+        dry_run = options['dry_run']
+        moved = merged = reclaimed = 0
+        # targets a dry run would have stored, the next files with the same content are merged into them:
+        planned = set()
+
+        names = ProductImage.objects.order_by('image').values_list('image', flat=True).distinct()
+        for name in names.iterator():
+            try:
+                with storage.open(name) as file:
+                    target = field.generate_filename(None, content_hash_filename(name, file))
+                    if target == name:
+                        continue
+                    duplicate = target in planned or storage.exists(target)
+                    if not duplicate and dry_run:
+                        planned.add(target)
+                    elif not duplicate:
+                        target = storage.save(target, file)
+            except FileNotFoundError:
+                self.stderr.write(f"{name} is missing from the storage")
+                continue
+
+            if duplicate:
+                merged += 1
+                reclaimed += storage.size(name)
+            else:
+                moved += 1
+            if dry_run:
+                continue
+
+            reclaimed += self.repoint(name, target, storage)
+
+        verb = "would reclaim" if dry_run else "reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"moved {moved} files, merged {merged} duplicates, {verb} {reclaimed / 1024 / 1024:.1f} MB"
+        ))
+
+    def repoint(self, name, target, storage):
+        """
+        Point the rows using `name` to `target` and delete the old file, returns the bytes of the deleted variants.
+        images merged into a file which has variants already take those over.
+        """
+        with transaction.atomic():
+            lock_files([target])
+            # a file merged into is stored again if the sweeper deleted it meanwhile:
+            if not storage.exists(target):
+                with storage.open(name) as file:
+                    target = storage.save(target, file)
+            shared = next(iter(ProductImage.objects.filter(image=target).exclude(variants={}).values_list(
+                'variants', flat=True
+            )), None)
+            images = ProductImage.objects.select_for_update().filter(image=name)
+            old_variants = {
+                path for variants in images.values_list('variants', flat=True) for path in variants.values()
+            }
+            images.update(image=target, **({'variants': shared} if shared else {}))
+            ImageUpload.objects.filter(image=name).update(image=target)
+
+        storage.delete(name)
+        deleted = 0
+        if shared:
+            for path in old_variants - set(shared.values()):
+                if storage.exists(path):
+                    deleted += storage.size(path)
+                    storage.delete(path)
+        return deleted
@@ -0,0 +1,30 @@
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from product.export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = "Stream every product with its image URLs as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson', dest='export_format')
+        parser.add_argument('--output', help="file to write to, defaults to stdout")
+        parser.add_argument('--base-url', default='', help="prefix of image URLs, e.g. https://shop.example.com")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        base_url = options['base_url']
+
+        def build_url(url):
+            return urljoin(base_url, url) if base_url else url
+
+        content = iter_export(options['export_format'], None, build_url, options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+                file.writelines(content)
+        else:
+            for chunk in content:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,66 @@
+import itertools
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from product.models import ImageUpload, MediaDeletion, ProductImage
+from product.tasks import sweep_media_batch
+
+
+class Command(BaseCommand):
+    help = "Queue the media files no row references for deletion and drain the media deletion queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help="seconds a file must be unchanged for, files of uploads still in progress are younger"
+        )
+        parser.add_argument('--dry-run', action='store_true', help="only report the orphaned files")
+
+    def handle(self, *args, **options):
+        storage = ProductImage._meta.get_field('image').storage
+        dry_run = options['dry_run']
+
+        referenced = self.referenced_names()
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        orphans, size = [], 0
+        for name in itertools.chain(walk(storage, 'product_images'), walk(storage, 'private')):
+            if name in referenced or storage.get_modified_time(name) > threshold:
+                continue
+            orphans.append(name)
+            size += storage.size(name)
+
+        swept = 0
+        if not dry_run:
+            # deleted by the sweeper, which keeps the files a row references by then, e.g. stored again meanwhile:
+            MediaDeletion.objects.bulk_create([MediaDeletion(name=name) for name in orphans], batch_size=1000)
+            while handled := sweep_media_batch():
+                swept += handled
+
+        verb = "found" if dry_run else "queued"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(orphans)} orphaned files ({size / 1024 / 1024:.1f} MB), swept {swept} queued deletions"
+        ))
+
+    def referenced_names(self):
+        referenced = set()
+        for name, variants in ProductImage.objects.values_list('image', 'variants').iterator():
+            referenced.add(name)
+            referenced.update(variants.values())
+        referenced.update(ImageUpload.objects.exclude(image='').values_list('image', flat=True).iterator())
+        # left to the sweeper, which checks them against the rows added meanwhile:
+        for deletion in MediaDeletion.objects.iterator():
+            referenced.update(deletion.paths)
+        return referenced
+
+
+def walk(storage, directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
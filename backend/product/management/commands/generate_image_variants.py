@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from product.models import ProductImage
+from product.tasks import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = "Generate resized renditions for product images that don't have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="regenerate variants of every image")
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.all()
+        if not options['all']:
+            images = images.filter(variants={})
+
+        processed = 0
+        for image_id in images.values_list('id', flat=True).iterator():
+            generate_image_variants(image_id, regenerate=options['all'])
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(f"processed {processed} images"))
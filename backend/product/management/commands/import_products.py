@@ -0,0 +1,96 @@
+import itertools
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from product.importer import IMPORT_FORMATS, import_batch, read_rows, validate_batch
+
+
+class Command(BaseCommand):
+    help = "Import products from a CSV/NDJSON supplier feed, upserting them by sku through COPY"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, dest='import_format',
+                            help="defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE)
+        parser.add_argument('--checkpoint', help="file recording the committed rows, an interrupted import resumes from it")
+        parser.add_argument('--images-dir', help="directory the `images` file names of the feed are relative to")
+        parser.add_argument('--owner', help="username owning the newly created products")
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        import_format = options['import_format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f"unknown format of {path}, use --format")
+
+        owner_id = None
+        if options['owner']:
+            try:
+                owner_id = get_user_model().objects.get(username=options['owner']).id
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"user {options['owner']} does not exist")
+
+        if settings.CACHE_BACKEND == settings.LOCAL_CACHE_BACKEND:
+            self.stdout.write(self.style.WARNING(
+                "the cache is local to this process, the web workers serve the imported products once their cached "
+                "responses expire (PRODUCT_CACHE_TIMEOUT), set CACHE_BACKEND and CACHE_LOCATION as for the workers"
+            ))
+
+        checkpoint = options['checkpoint']
+        done_rows = self.load_checkpoint(checkpoint, path)
+        if done_rows:
+            self.stdout.write(f"resuming after row {done_rows}")
+
+        totals = {'created': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0}
+        started = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = read_rows(file, import_format)
+            while batch := list(itertools.islice(rows, options['batch_size'])):
+                last_row = batch[-1][0]
+                batch = [(number, row) for number, row in batch if number > done_rows]
+                if not batch:
+                    continue
+
+                valid, errors = validate_batch(batch, options['images_dir'])
+                for number, error in errors:
+                    self.stderr.write(f"row {number}: {error}")
+                created, updated = import_batch(valid, owner_id)
+                self.save_checkpoint(checkpoint, path, last_row)
+
+                totals['created'] += created
+                totals['updated'] += updated
+                totals['unchanged'] += len(valid) - created - updated
+                totals['invalid'] += len(errors)
+                elapsed = time.perf_counter() - started
+                processed = sum(totals.values())
+                self.stdout.write(f"row {last_row}: {processed} rows in {elapsed:.1f}s ({processed / elapsed:,.0f} rows/s)")
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.perf_counter() - started
+        processed = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"imported {processed} rows in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):,.0f} rows/s): "
+            + ', '.join(f"{count} {name}" for name, count in totals.items())
+        ))
+
+    def load_checkpoint(self, checkpoint, path):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as file:
+            state = json.load(file)
+        if state['source'] != path:
+            raise CommandError(f"checkpoint {checkpoint} belongs to {state['source']}")
+        return state['rows']
+
+    def save_checkpoint(self, checkpoint, path, rows):
+        if not checkpoint:
+            return
+        with open(f"{checkpoint}.tmp", 'w') as file:
+            json.dump({'source': path, 'rows': rows}, file)
+        os.replace(f"{checkpoint}.tmp", checkpoint)
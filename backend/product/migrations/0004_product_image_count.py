@@ -0,0 +1,30 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_images(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductImage = apps.get_model('product', 'ProductImage')
+    image_counts = ProductImage.objects.filter(
+        product=OuterRef('pk')
+    ).order_by().values('product').annotate(count=Count('id')).values('count')
+    Product.objects.update(image_count=Coalesce(Subquery(image_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_productimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON product_product
+    FOR EACH ROW EXECUTE FUNCTION product_search_vector_update();
+
+UPDATE product_product SET
+    search_vector =
+        setweight(to_tsvector('pg_catalog.english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(description, '')), 'B');
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER IF EXISTS product_search_vector_trigger ON product_product;
+DROP FUNCTION IF EXISTS product_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_product_image_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+    ]
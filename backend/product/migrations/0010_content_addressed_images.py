@@ -0,0 +1,28 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:58
+
+from django.db import migrations, models
+import product.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0009_imageupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imageupload',
+            name='image',
+            field=product.fields.ContentAddressedImageField(blank=True, upload_to='product_images/'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=product.fields.ContentAddressedImageField(upload_to='product_images/'),
+        ),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['image'], name='product_image_file_idx'),
+        ),
+    ]
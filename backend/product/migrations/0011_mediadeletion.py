@@ -0,0 +1,49 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+# one INSERT ... SELECT per DELETE statement, cascades and queryset deletes included:
+MEDIA_DELETION_TRIGGER = """
+CREATE FUNCTION product_image_queue_deletion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO product_mediadeletion (name, variants, created_at)
+    SELECT image, variants, now() FROM deleted_images;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_image_deletion_trigger
+    AFTER DELETE ON product_productimage
+    REFERENCING OLD TABLE AS deleted_images
+    FOR EACH STATEMENT EXECUTE FUNCTION product_image_queue_deletion();
+"""
+
+DROP_MEDIA_DELETION_TRIGGER = """
+DROP TRIGGER IF EXISTS product_image_deletion_trigger ON product_productimage;
+DROP FUNCTION IF EXISTS product_image_queue_deletion();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0010_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('variants', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'mediaDeletion',
+                'verbose_name_plural': 'mediaDeletions',
+            },
+        ),
+        migrations.RunSQL(MEDIA_DELETION_TRIGGER, DROP_MEDIA_DELETION_TRIGGER),
+    ]
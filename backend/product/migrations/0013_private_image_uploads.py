@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:50
+
+from django.db import migrations
+import product.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0012_product_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imageupload',
+            name='image',
+            field=product.fields.ContentAddressedImageField(blank=True, upload_to='private/uploads/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0013_private_image_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='writing_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,26 +1,70 @@
-from django.db import models
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from decouple import config
 
-from .utils import generate_filename
+from .fields import ContentAddressedImageField
 
 
 User = get_user_model()
 
 MAX_IMG_SIZE = config('MAX_IMG_SIZE', cast=int, default=2097152)
 MAX_IMG_PER_PRODUCT = (config('MAX_ING_PER_PRODUCT', cast=int, default=5))
+# text search configuration used by the search_vector trigger and by queries:
+SEARCH_CONFIG = 'english'
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def search(self, term):
+        """
+        Full text search over the indexed title/description vector, best matches first.
+        """
+        query = SearchQuery(term, config=SEARCH_CONFIG, search_type='websearch')
+        return self.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
 
 
 class Product(models.Model):
+    # supplier stock keeping unit, the natural key of catalog imports:
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     title = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=12, decimal_places=2)
     description = models.TextField()
-    owner = models.ForeignKey(User, related_name='products', on_delete=models.SET_NULL, null=True)
+    # indexed through the (owner, id) composite index below:
+    owner = models.ForeignKey(User, related_name='products', on_delete=models.SET_NULL, null=True, db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # bumped by every change of the product or its images, drives ETag/Last-Modified:
+    updated_at = models.DateTimeField(auto_now=True)
+    # denormalized number of images, only changed by reserve/release_image_slots and the update reconciliation:
+    image_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    # bumped by every write of the product columns or of its image set, updates compare-and-set on it:
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # weighted title (A) + description (B) tsvector, kept current by a database trigger:
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # columns maintained by the database, never written back from memory:
+    DB_MAINTAINED_FIELDS = ('image_count', 'search_vector')
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'product'
         verbose_name_plural = 'products'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            # list filters/orderings, `id` makes every ordering total:
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['owner', 'id'], name='product_owner_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_at_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -28,19 +72,74 @@ class Product(models.Model):
     def clean(self):
         if not self.title or not self.description:
             raise ValidationError(f"title and description could not be empty")
+        # products without a sku are stored as NULL so they don't collide on the unique index:
+        self.sku = self.sku or None
 
     def save(self, *args, **kwargs):
-        self.full_clean()
+        if kwargs.get('update_fields') is None:
+            self.full_clean()
+        else:  # only the written columns are validated, e.g. no owner lookup when the title changes
+            self.full_clean(exclude=[f.name for f in self._meta.fields if f.name not in kwargs['update_fields']])
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            self.version += 1
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DB_MAINTAINED_FIELDS
+            ]
         super().save(*args, **kwargs)
 
+    @property
+    def etag(self):
+        return product_etag(self.id, self.updated_at)
+
+    @property
+    def last_modified(self):
+        return int(self.updated_at.timestamp())
+
+    @classmethod
+    def touch(cls, product_id):
+        """
+        Mark a product as modified after a change of its images.
+        """
+        cls.objects.filter(id=product_id).update(updated_at=timezone.now())
+
+    @classmethod
+    def reserve_image_slots(cls, product_id, count):
+        """
+        Atomically add `count` to the image counter of a product in one UPDATE,
+        the row is only updated while the result stays within MAX_IMG_PER_PRODUCT.
+        """
+        reserved = cls.objects.filter(
+            id=product_id, image_count__lte=MAX_IMG_PER_PRODUCT - count
+        ).update(image_count=F('image_count') + count, version=F('version') + 1, updated_at=timezone.now())
+        if not reserved:
+            raise ValidationError(f"Max image count for product is {MAX_IMG_PER_PRODUCT}")
+
+    @classmethod
+    def release_image_slots(cls, product_id, count):
+        cls.objects.filter(id=product_id, image_count__gte=count).update(
+            image_count=F('image_count') - count, version=F('version') + 1, updated_at=timezone.now()
+        )
+
+
+def product_etag(product_id, updated_at):
+    return f'"{product_id}-{int(updated_at.timestamp() * 1000000)}"'
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
-    image = models.ImageField(upload_to=generate_filename)
+    # named after the sha256 of the content, products using the same photo share the file and its variants:
+    image = ContentAddressedImageField(upload_to='product_images/')
+    # resized renditions generated in background, {"<size>_<format>": "<storage path>"}:
+    variants = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'productImage'
         verbose_name_plural = 'productImages'
+        indexes = [
+            # references of a shared file, checked before it is deleted:
+            models.Index(fields=['image'], name='product_image_file_idx'),
+        ]
 
     def __str__(self):
         return f"{self.image.name} for {self.product}"
@@ -52,6 +151,59 @@ class ProductImage(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        if self.product.images.count() == MAX_IMG_PER_PRODUCT:
-            raise ValidationError(f"Max image count for product is {MAX_IMG_PER_PRODUCT}")
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            Product.reserve_image_slots(self.product_id, 1)
+            super().save(*args, **kwargs)
+
+
+class ImageUpload(models.Model):
+    """
+    Product image uploaded in chunks ahead of the product create/update request which references its token.
+    chunks are appended to a staging file, the image is moved to the storage once `received` reaches `size`.
+    """
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    owner = models.ForeignKey(User, related_name='image_uploads', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    # bytes written to the staging file so far, only advanced by compare-and-set, see product.uploads.write_chunk:
+    received = models.PositiveIntegerField(default=0)
+    # set while a chunk is being written, a concurrent chunk is refused until it expires:
+    writing_until = models.DateTimeField(null=True, blank=True, editable=False)
+    # set once the upload is complete, out of the publicly served product_images until a product claims it:
+    image = ContentAddressedImageField(upload_to='private/uploads/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'imageUpload'
+        verbose_name_plural = 'imageUploads'
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    @property
+    def complete(self):
+        return bool(self.image)
+
+
+class MediaDeletion(models.Model):
+    """
+    Stored file waiting to be deleted with its variants, queued in the transaction deleting its last row.
+    product images are queued by a database trigger, the files are removed by the sweeper after commit
+    and only if no row references them anymore, see product.tasks.sweep_media_deletions.
+    """
+    name = models.CharField(max_length=100)
+    variants = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'mediaDeletion'
+        verbose_name_plural = 'mediaDeletions'
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def paths(self):
+        return [self.name, *self.variants.values()]
@@ -1,8 +1,38 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import ProductImage
+from .models import Product, ProductImage
+from .cache import invalidate_product
+from .tasks import schedule_image_variants, schedule_media_sweep
 
 
 @receiver(post_delete, sender=ProductImage)
 def delete_images_from_media(sender, instance, **kwargs):
-    instance.image.delete(save=False)
+    # the deleted rows were queued by the product_image_deletion_trigger, files are removed after commit:
+    schedule_media_sweep()
+
+
+@receiver(post_delete, sender=ProductImage)
+def release_image_slot(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Product):  # the product row is deleted as well
+        return
+    Product.release_image_slots(instance.product_id, 1)
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_variants(sender, instance, created, **kwargs):
+    if created:
+        schedule_image_variants([instance.id])
+    else:  # new slots are marked by reserve_image_slots already
+        Product.touch(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    invalidate_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image_cache(sender, instance, **kwargs):
+    invalidate_product(instance.product_id)
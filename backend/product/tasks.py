@@ -0,0 +1,185 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cache import invalidate_product
+from .fields import lock_files
+from .models import ImageUpload, MediaDeletion, Product, ProductImage
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_sweep_lock = threading.Lock()
+_sweep_requested = threading.Event()
+
+
+def get_executor():
+    """
+    Shared worker pool of the product background jobs, created on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='product-worker'
+            )
+    return _executor
+
+
+def run_in_background(func, *args):
+    """
+    Run `func` in the worker pool once the current transaction commits,
+    or right after commit in the calling thread when BACKGROUND_EAGER is set (tests, management commands).
+    """
+    def submit():
+        if settings.BACKGROUND_EAGER:
+            func(*args)
+        else:
+            get_executor().submit(_run_job, func, *args)
+
+    transaction.on_commit(submit)
+
+
+def _run_job(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("background job %s failed", func.__name__)
+    finally:
+        # worker threads own their db connection:
+        connection.close()
+
+
+def variant_formats():
+    """
+    WebP is always produced, AVIF only if the installed Pillow has an AVIF encoder.
+    """
+    formats = ['webp']
+    if '.avif' in Image.registered_extensions():
+        formats.append('avif')
+    return formats
+
+
+def variant_filename(image_name, size_name, image_format):
+    base, _ = os.path.splitext(os.path.basename(image_name))
+    return f"product_images/variants/{base}_{size_name}.{image_format}"
+
+
+def render_variants(product_image):
+    """
+    Write one resized rendition per configured size and format, returns the stored paths.
+    """
+    storage = product_image.image.storage
+    with product_image.image.open('rb') as file:
+        with Image.open(file) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    variants = {}
+    for size_name, size in settings.IMAGE_VARIANT_SIZES.items():
+        resized = original.copy()
+        resized.thumbnail((size, size))
+        for image_format in variant_formats():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format.upper(), quality=settings.IMAGE_VARIANT_QUALITY)
+            name = variant_filename(product_image.image.name, size_name, image_format)
+            # images sharing a file share its variants, they are replaced in place:
+            storage.delete(name)
+            variants[f"{size_name}_{image_format}"] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def generate_image_variants(image_id, regenerate=False):
+    """
+    Render the variants of an image, or reuse those of an image sharing its file unless `regenerate` is set.
+    """
+    try:
+        product_image = ProductImage.objects.get(id=image_id)
+    except ProductImage.DoesNotExist:
+        return
+
+    siblings = list(ProductImage.objects.filter(image=product_image.image.name).exclude(id=image_id).values_list(
+        'variants', flat=True
+    ))
+    variants = next((variants for variants in siblings if variants), None)
+    if variants is None or regenerate:
+        try:
+            variants = render_variants(product_image)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning("could not generate variants of %s: %s", product_image.image.name, e)
+            return
+
+    # variants still listed by the images sharing the file are kept:
+    shared = {path for sibling in siblings for path in sibling.values()}
+    updated = ProductImage.objects.filter(id=image_id).update(variants=variants)
+    if not updated:  # image was deleted meanwhile
+        MediaDeletion.objects.create(name=product_image.image.name, variants=variants)
+        sweep_media_deletions()
+        return
+    for path in set(product_image.variants.values()) - set(variants.values()) - shared:
+        product_image.image.storage.delete(path)
+    Product.touch(product_image.product_id)
+    invalidate_product(product_image.product_id)
+
+
+def schedule_image_variants(image_ids):
+    for image_id in image_ids:
+        run_in_background(generate_image_variants, image_id)
+
+
+def sweep_media_batch():
+    """
+    Delete the files of up to MEDIA_SWEEP_BATCH_SIZE queued deletions, returns the number of deletions handled.
+    files referenced again meanwhile, or by a row being written, are kept. queue rows locked by another sweeper
+    are skipped.
+    """
+    storage = ProductImage._meta.get_field('image').storage
+    with transaction.atomic():
+        queued = list(MediaDeletion.objects.select_for_update(skip_locked=True).order_by('id')[
+            :settings.MEDIA_SWEEP_BATCH_SIZE
+        ])
+        if not queued:
+            return 0
+        names = {deletion.name for deletion in queued}
+        # waits for the transactions writing rows of these files, their rows are seen by the query below:
+        lock_files(names, shared=False)
+        in_use = set(ProductImage.objects.filter(image__in=names).values_list('image', flat=True).union(
+            ImageUpload.objects.filter(image__in=names).values_list('image', flat=True)
+        ))
+        # files go before the queue rows, a batch failing half way is retried:
+        for deletion in queued:
+            if deletion.name not in in_use:
+                for path in deletion.paths:
+                    storage.delete(path)
+        MediaDeletion.objects.filter(id__in=[deletion.id for deletion in queued]).delete()
+    return len(queued)
+
+
+def sweep_media_deletions():
+    """
+    Drain the media deletion queue, one sweep at a time per process.
+    a sweep requested while another one runs makes the running one go over the queue again.
+    """
+    _sweep_requested.set()
+    while _sweep_requested.is_set() and _sweep_lock.acquire(blocking=False):
+        try:
+            _sweep_requested.clear()
+            while sweep_media_batch():
+                pass
+        finally:
+            _sweep_lock.release()
+
+
+def schedule_media_sweep():
+    run_in_background(sweep_media_deletions)
@@ -0,0 +1,120 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from product.cache import invalidate_product
+from product.models import Product
+
+
+class ProductResponseCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.baseline = self.cache_counts(since={'hits': 0, 'misses': 0})
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.product = Product.objects.create(
+            title='p_1',
+            price=Decimal('8000'),
+            description='desc of p_1',
+            owner=self.user
+        )
+
+    def cache_counts(self, since=None):
+        # the counters are process wide, counted from setUp:
+        since = since or self.baseline
+        return {
+            name: REGISTRY.get_sample_value(f'product_response_cache_{name}_total') - since[name]
+            for name in ('hits', 'misses')
+        }
+
+    def test_anonymous_detail_is_served_from_cache(self):
+        path = f"/api/v1/products/{self.product.id}"
+        self.client.get(path)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.product.id)
+        self.assertEqual(self.cache_counts(), {'hits': 1, 'misses': 1})
+
+    def test_list_cache_is_keyed_by_query_params(self):
+        self.client.get('/api/v1/products/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/products/')
+
+        response = self.client.get('/api/v1/products/?page_size=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cache_counts(), {'hits': 1, 'misses': 2})
+
+    def test_product_save_invalidates_list_and_detail(self):
+        path = f"/api/v1/products/{self.product.id}"
+        self.client.get(path)
+        self.client.get('/api/v1/products/')
+
+        self.product.title = 'changed title'
+        self.product.save()
+
+        self.assertEqual(self.client.get(path).data['title'], 'changed title')
+        self.assertEqual(self.client.get('/api/v1/products/').data['results'][0]['title'], 'changed title')
+
+    def test_other_product_save_keeps_detail_cached(self):
+        path = f"/api/v1/products/{self.product.id}"
+        self.client.get(path)
+
+        Product.objects.create(title='p_2', price=Decimal('10'), description='desc of p_2', owner=self.user)
+
+        with self.assertNumQueries(0):
+            self.client.get(path)
+
+    def test_product_delete_invalidates_detail(self):
+        path = f"/api/v1/products/{self.product.id}"
+        self.client.get(path)
+
+        self.product.delete()
+
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+    def test_authenticated_requests_bypass_cache(self):
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.client.get('/api/v1/products/')
+        self.client.get('/api/v1/products/')
+
+        self.assertEqual(self.cache_counts(), {'hits': 0, 'misses': 0})
+
+    def test_anonymous_responses_are_cacheable_by_proxies(self):
+        for path in ('/api/v1/products/', f"/api/v1/products/{self.product.id}"):
+            response = self.client.get(path)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertIn('s-maxage=5', response['Cache-Control'])
+            self.assertIn('Authorization', response['Vary'])
+            self.assertIn('Accept', response['Vary'])
+
+        self.assertNotIn('public', self.client.get('/api/v1/products/0').get('Cache-Control', ''))
+
+    def test_authenticated_responses_are_private(self):
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.get(f"/api/v1/products/{self.product.id}")
+
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+        self.assertIn('Authorization', response['Vary'])
+
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        path = f"/api/v1/products/{self.product.id}"
+        self.client.get(path)
+        Product.objects.filter(id=self.product.id).update(title='changed')
+        # a write, then the generation key evicted (LRU) before the next read:
+        invalidate_product(self.product.id)
+        cache.delete(f'products:detail:{self.product.id}:generation')
+
+        self.assertEqual(self.client.get(path).data['title'], 'changed')
@@ -0,0 +1,160 @@
+import shutil
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from product.api.serializers import ProductUpdateSerializer
+from product.models import Product, ProductImage
+from product.utils import create_image, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+class ProductConditionalRequestTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.product = Product.objects.create(
+            title='p_1',
+            price=Decimal('8000'),
+            description='desc of p_1',
+            owner=self.user
+        )
+        self.path = f"/api/v1/products/{self.product.id}"
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def authenticate(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(self.user)))
+
+    def test_detail_validators(self):
+        response = self.client.get(self.path)
+
+        self.assertEqual(response['ETag'], self.product.etag)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=self.product.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.product.etag)
+
+        response = self.client.get(self.path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_images_and_serialization(self):
+        self.authenticate()  # authenticated requests are not served from the response cache
+        etag = self.client.get(self.path)['ETag']
+
+        with self.assertNumQueries(1):  # product, the token user is cached
+            response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA)
+    def test_image_change_modifies_product(self):
+        etag = self.client.get(self.path)['ETag']
+
+        ProductImage.objects.create(product=self.product, image=create_image(1024))
+
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['images']), 1)
+
+    def test_list_validators(self):
+        etag = self.client.get('/api/v1/products/')['ETag']
+
+        response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Product.objects.create(title='p_2', price=Decimal('10'), description='desc of p_2', owner=self.user)
+
+        response = self.client.get('/api/v1/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_etag_depends_on_query(self):
+        etag = self.client.get('/api/v1/products/')['ETag']
+        response = self.client.get('/api/v1/products/?ordering=price', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA)
+    def test_update_if_match(self):
+        self.authenticate()
+        image = ProductImage.objects.create(product=self.product, image=create_image(1024))
+        self.product.refresh_from_db()
+        stale_etag = self.product.etag
+        data = {'title': 'new p_1', 'price': '8000', 'description': 'desc of p_1', 'old_images_ids': [image.id]}
+
+        response = self.client.put(self.path, data, HTTP_IF_MATCH=stale_etag)
+        self.assertEqual(response.status_code, 200)
+        new_etag = response['ETag']
+        self.assertNotEqual(new_etag, stale_etag)
+
+        response = self.client.put(self.path, {**data, 'title': 'lost update'}, HTTP_IF_MATCH=stale_etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Product.objects.get(id=self.product.id).title, 'new p_1')
+
+        self.assertEqual(self.client.get(self.path, HTTP_IF_NONE_MATCH=new_etag).status_code, 304)
+
+    def test_delete_if_match(self):
+        self.authenticate()
+        response = self.client.delete(self.path, HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 412)
+
+        response = self.client.delete(self.path, HTTP_IF_MATCH=self.product.etag)
+        self.assertEqual(response.status_code, 204)
+
+    def concurrent_put(self, data, **headers):
+        """
+        PUT `data` while another request commits a write of the product between the read and the update.
+        """
+        store_images = ProductUpdateSerializer.store_images
+
+        def write_meanwhile(serializer, new_images):
+            Product.objects.filter(id=self.product.id).update(title='concurrent', version=F('version') + 1)
+            return store_images(serializer, new_images)
+
+        with mock.patch.object(ProductUpdateSerializer, 'store_images', write_meanwhile):
+            return self.client.put(self.path, data, format='json', **headers)
+
+    def test_update_bumps_version(self):
+        self.authenticate()
+        data = {'title': 'new p_1', 'price': '8000', 'description': 'desc of p_1', 'old_images_ids': []}
+
+        response = self.client.put(self.path, data, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get(id=self.product.id).version, self.product.version + 1)
+
+    def test_concurrent_update_conflicts(self):
+        self.authenticate()
+        data = {'title': 'new p_1', 'price': '8000', 'description': 'desc of p_1', 'old_images_ids': []}
+
+        response = self.concurrent_put(data)
+        self.assertEqual(response.status_code, 409)
+
+        response = self.concurrent_put(data, HTTP_IF_MATCH=Product.objects.get(id=self.product.id).etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Product.objects.get(id=self.product.id).title, 'concurrent')
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA, PRODUCT_UPDATE_LOCKING='pessimistic')
+    def test_pessimistic_update(self):
+        self.authenticate()
+        image = ProductImage.objects.create(product=self.product, image=create_image(1024))
+        data = {'title': 'new p_1', 'price': '8000', 'description': 'desc of p_1', 'old_images_ids': [image.id]}
+
+        response = self.client.put(self.path, data, HTTP_IF_MATCH=Product.objects.get(id=self.product.id).etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get(id=self.product.id).title, 'new p_1')
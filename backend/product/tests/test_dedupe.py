@@ -0,0 +1,166 @@
+import io
+import shutil
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from product.api.serializers import ProductUpdateSerializer
+from product.models import Product, ProductImage
+from product.tasks import sweep_media_batch
+from product.utils import generate_photo_file, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, BACKGROUND_EAGER=True)
+class ContentAddressedImageTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='test_user', password='user1234')
+        self.products = [
+            Product.objects.create(title=f'product {i}', price=1000, description='desc', owner=self.user)
+            for i in range(3)
+        ]
+        self.photo = generate_photo_file().read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def create_image(self, product, content=None):
+        return ProductImage.objects.create(product=product, image=SimpleUploadedFile('Photo.PNG', content or self.photo))
+
+    def test_identical_images_share_one_file(self):
+        first, second = (self.create_image(product) for product in self.products[:2])
+        other = self.create_image(self.products[2], generate_photo_file().getvalue() + b'\x00')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^product_images/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertNotEqual(other.image.name, first.image.name)
+
+    def test_file_is_deleted_with_last_reference(self):
+        first, second = (self.create_image(product) for product in self.products[:2])
+        storage, name = first.image.storage, first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_file_swept_before_update_commits_is_stored_again(self):
+        first = self.create_image(self.products[0])
+        storage, name = first.image.storage, first.image.name
+        client = APIClient()
+        client.force_authenticate(self.user)
+        reconcile = ProductUpdateSerializer.reconcile
+
+        def delete_first_then_reconcile(*args):
+            # the same photo is deleted from the other product and swept between storing and writing the row:
+            ProductImage.objects.filter(id=first.id).delete()
+            sweep_media_batch()
+            self.assertFalse(storage.exists(name))
+            return reconcile(*args)
+
+        with mock.patch.object(ProductUpdateSerializer, 'reconcile', delete_first_then_reconcile):
+            response = client.patch(f'/api/v1/products/{self.products[1].id}', {
+                'new_images': [SimpleUploadedFile('Photo.PNG', self.photo)]
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.products[1].images.get().image.name, name)
+        self.assertTrue(storage.exists(name))
+
+    @override_settings(IMAGE_VARIANT_SIZES={'thumbnail': 4})
+    def test_variants_are_shared(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.create_image(self.products[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.create_image(self.products[1])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.variants)
+        self.assertEqual(first.variants, second.variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(second.image.storage.exists(path) for path in second.variants.values()))
+
+    def test_dedupe_merges_existing_files(self):
+        images = [self.create_image(product) for product in self.products]
+        storage = images[0].image.storage
+        # files stored under per upload names before content addressing:
+        legacy_names = [storage.save(f'product_images/legacy_{i}.png', ContentFile(self.photo)) for i in range(3)]
+        storage.delete(images[0].image.name)
+        for image, name in zip(images, legacy_names):
+            ProductImage.objects.filter(id=image.id).update(image=name)
+
+        out = io.StringIO()
+        call_command('dedupe_images', '--dry-run', stdout=out)
+        self.assertIn("moved 1 files, merged 2 duplicates", out.getvalue())
+        self.assertEqual(set(ProductImage.objects.values_list('image', flat=True)), set(legacy_names))
+
+        out = io.StringIO()
+        call_command('dedupe_images', stdout=out)
+
+        names = set(ProductImage.objects.values_list('image', flat=True))
+        self.assertEqual(names, {images[0].image.name})
+        self.assertTrue(storage.exists(images[0].image.name))
+        self.assertFalse(any(storage.exists(name) for name in legacy_names))
+        self.assertIn("moved 1 files, merged 2 duplicates", out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, BACKGROUND_EAGER=True)
+class SharedFileSweepTest(TransactionTestCase):
+
+    def test_sweep_waits_for_image_being_written(self):
+        user = get_user_model().objects.create(username='test_user', password='user1234')
+        first_product, second_product = (
+            Product.objects.create(title=f'product {i}', price=1000, description='desc', owner=user) for i in range(2)
+        )
+        photo = generate_photo_file().read()
+        first = ProductImage.objects.create(product=first_product, image=SimpleUploadedFile('photo.png', photo))
+        storage, name = first.image.storage, first.image.name
+        written, release = threading.Event(), threading.Event()
+
+        def add_image():
+            try:
+                with transaction.atomic():
+                    ProductImage.objects.create(product=second_product, image=SimpleUploadedFile('copy.png', photo))
+                    written.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        def sweep():
+            try:
+                sweep_media_batch()
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=add_image)
+        writer.start()
+        self.assertTrue(written.wait(5))
+        with mock.patch('product.signals.schedule_media_sweep'):
+            first.delete()
+        sweeper = threading.Thread(target=sweep)
+        sweeper.start()
+        sweeper.join(0.5)
+        # the file of the uncommitted image is locked:
+        self.assertTrue(sweeper.is_alive())
+        release.set()
+        writer.join()
+        sweeper.join()
+
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(ProductImage.objects.get().image.name, name)
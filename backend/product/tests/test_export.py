@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import shutil
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from product.models import Product, ProductImage
+from product.utils import create_image, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, EXPORT_CHUNK_SIZE=2)
+class ProductExportTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.products = [
+            Product.objects.create(title=f'p_{i}', price=Decimal('10.5'), description=f'desc, "{i}"', owner=self.user)
+            for i in range(5)
+        ]
+        self.image = ProductImage.objects.create(product=self.products[0], image=create_image(1024))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/v1/products/export.ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([r['id'] for r in records], [p.id for p in self.products])
+        self.assertEqual(records[0]['price'], '10.50')
+        self.assertEqual(records[0]['images'], [f'http://testserver{self.image.image.url}'])
+        self.assertEqual(records[1]['images'], [])
+
+    async def test_ndjson_export_asgi(self):
+        response = await self.async_client.get('/api/v1/products/export.ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        # streamed a chunk of rows at a time, not buffered by the ASGI handler:
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        records = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual([r['id'] for r in records], [p.id for p in self.products])
+
+    def test_csv_export(self):
+        response = self.client.get('/api/v1/products/export.csv', {'min_price': '10'})
+
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2]['description'], 'desc, "2"')
+        self.assertEqual(rows[0]['images'], f'http://testserver{self.image.image.url}')
+
+    def test_export_applies_filters(self):
+        response = self.client.get('/api/v1/products/export.ndjson', {'min_price': '11'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/v1/products/export.xml').status_code, 404)
+
+    def test_export_command(self):
+        out = io.StringIO()
+        call_command('export_products', '--base-url', 'https://shop.example.com', stdout=out)
+        out.seek(0)
+
+        records = [json.loads(line) for line in out]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]['images'], [f'https://shop.example.com{self.image.image.url}'])
@@ -0,0 +1,94 @@
+import shutil
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.renderers import ORJSONRenderer
+from product.api.rows import serialize_products
+from product.models import Product, ProductImage
+from product.utils import create_image, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class ProductFastReadsTest(TestCase):
+    """
+    The values() based reads send the same bytes as the DRF serializers.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.products = [
+            Product.objects.create(
+                title=f'p_{i} "quoted" é ', price=Decimal('1000.5') + i, description=f'desc of p_{i}\n\t',
+                owner=self.user, sku=f'SKU-{i}' if i % 2 else None
+            )
+            for i in range(25)
+        ]
+        for product in self.products[-3:]:
+            image = ProductImage.objects.create(product=product, image=create_image(1024))
+            variants = {'thumbnail_webp': 'product_images/variants/t.webp'}
+            ProductImage.objects.filter(id=image.id).update(variants=variants)
+            ProductImage.objects.create(product=product, image=create_image(1024))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def assertSameResponse(self, path, **params):
+        responses = []
+        for fast in (False, True):
+            cache.clear()
+            with self.settings(PRODUCT_FAST_READS=fast):
+                responses.append(self.client.get(path, params))
+        serialized, fast = responses
+        self.assertEqual(serialized.status_code, 200)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, serialized.content)
+        self.assertEqual(fast['ETag'], serialized['ETag'])
+        return fast
+
+    def test_list_parity(self):
+        self.assertSameResponse('/api/v1/products/')
+        self.assertSameResponse('/api/v1/products/', page=2, ordering='-price')
+        self.assertSameResponse('/api/v1/products/', pagination='cursor', ordering='price', min_price='1005')
+        self.assertSameResponse('/api/v1/products/', q='quoted')
+
+    def test_detail_parity(self):
+        response = self.assertSameResponse(f'/api/v1/products/{self.products[-1].id}')
+        self.assertEqual(len(response.data['images']), 2)
+        self.assertSameResponse(f'/api/v1/products/{self.products[0].id}')
+
+    def test_fast_reads_query_count(self):
+        with self.settings(PRODUCT_FAST_READS=True), \
+                mock.patch('product.api.views.serialize_products', wraps=serialize_products) as serialize:
+            with self.assertNumQueries(3):  # count, page, images
+                self.client.get('/api/v1/products/')
+            with self.assertNumQueries(2):  # product, images
+                self.client.get(f'/api/v1/products/{self.products[-1].id}')
+            self.assertEqual(self.client.get('/api/v1/products/0').status_code, 404)
+        self.assertEqual(serialize.call_count, 2)
+
+
+class ORJSONRendererTest(TestCase):
+
+    def test_same_bytes_as_json_renderer(self):
+        data = {
+            'text': 'quotes " \\ / \n\t\x00\x1f é \u2028\u2029 \U0001f600', 'int': 2 ** 62, 'float': 1.1,
+            'decimal': Decimal('12.50'), 'none': None, 'bool': True, 'datetime': timezone.now(),
+            'nested': [{'a': []}, {}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        # over 64 bits, rendered by the stdlib encoder:
+        self.assertEqual(ORJSONRenderer().render({'big': 2 ** 70}), JSONRenderer().render({'big': 2 ** 70}))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
@@ -0,0 +1,187 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from product.importer import import_batch, validate_batch
+from product.models import Product
+from product.utils import generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class ImportProductsCommandTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def write(self, name, content):
+        path = os.path.join(self.workdir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def call(self, *args, **options):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_products', *args, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_import(self):
+        path = self.write('feed.csv', 'sku,title,price,description\n'
+                                      'A-1,first,10.5,"desc, 1"\n'
+                                      'A-2,second,20,desc 2\n')
+        stdout, stderr = self.call(path, owner='test_user')
+
+        self.assertEqual(stderr, '')
+        self.assertIn('2 created', stdout)
+        product = Product.objects.get(sku='A-1')
+        self.assertEqual(product.price, Decimal('10.50'))
+        self.assertEqual(product.description, 'desc, 1')
+        self.assertEqual(product.owner, self.user)
+        # the search vector trigger runs for copied rows too:
+        self.assertEqual(list(Product.objects.search('second').values_list('sku', flat=True)), ['A-2'])
+
+    def test_ndjson_upsert(self):
+        Product.objects.create(sku='A-1', title='old', price=1, description='old desc', owner=self.user)
+        Product.objects.create(sku='A-2', title='same', price=2, description='same desc', owner=self.user)
+        path = self.write('feed.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'sku': 'A-1', 'title': 'new', 'price': 1, 'description': 'new desc'},
+            {'sku': 'A-2', 'title': 'same', 'price': '2.00', 'description': 'same desc'},
+            {'sku': 'A-3', 'title': 'third', 'price': 3, 'description': 'desc'},
+        ]))
+        stdout, _ = self.call(path)
+
+        self.assertIn('1 created, 1 updated, 1 unchanged, 0 invalid', stdout)
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(sku='A-1').title, 'new')
+        self.assertIsNone(Product.objects.get(sku='A-3').owner)
+
+    def test_import_invalidates_cached_responses(self):
+        cache.clear()
+        product = Product.objects.create(sku='A-1', title='old', price=1, description='old desc', owner=self.user)
+        client = APIClient()
+        self.assertEqual(client.get(f'/api/v1/products/{product.id}').data['title'], 'old')
+        self.assertEqual(client.get('/api/v1/products/').data['count'], 1)
+        path = self.write('feed.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'sku': 'A-1', 'title': 'new', 'price': 1, 'description': 'old desc'},
+            {'sku': 'A-2', 'title': 'second', 'price': 2, 'description': 'desc'},
+        ]))
+
+        with mock.patch('product.cache.cache.incr', wraps=cache.incr) as incr:
+            self.call(path)
+
+        self.assertEqual(incr.call_count, 1)
+        self.assertEqual(client.get(f'/api/v1/products/{product.id}').data['title'], 'new')
+        self.assertEqual(client.get('/api/v1/products/').data['count'], 2)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        path = self.write('feed.ndjson', '{"sku": "A-1", "title": "ok", "price": 1, "description": "d"}\n'
+                                         '{"sku": "A-2", "title": "", "price": 1, "description": "d"}\n'
+                                         '{"sku": "A-3", "title": "t", "price": "abc", "description": "d"}\n'
+                                         'not json\n')
+        stdout, stderr = self.call(path)
+
+        self.assertIn('1 created', stdout)
+        self.assertIn('3 invalid', stdout)
+        self.assertIn('row 2: title', stderr)
+        self.assertIn('row 3: invalid price', stderr)
+        self.assertIn('row 4: invalid json', stderr)
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['A-1'])
+
+    def test_repeated_sku_keeps_last_row(self):
+        valid, errors = validate_batch([
+            (1, {'sku': 'A-1', 'title': 'first', 'price': 1, 'description': 'd'}),
+            (2, {'sku': 'A-1', 'title': 'second', 'price': 1, 'description': 'd'}),
+        ], None)
+        self.assertEqual(errors, [])
+        self.assertEqual(import_batch(valid), (1, 0))
+        self.assertEqual(Product.objects.get(sku='A-1').title, 'second')
+
+    def test_checkpoint_resumes_after_committed_rows(self):
+        path = self.write('feed.csv', 'sku,title,price,description\n' + ''.join(
+            f'A-{i},title {i},{i},desc {i}\n' for i in range(1, 6)
+        ))
+        checkpoint = os.path.join(self.workdir, 'feed.checkpoint')
+        with open(checkpoint, 'w') as file:
+            json.dump({'source': path, 'rows': 3}, file)
+
+        stdout, _ = self.call(path, checkpoint=checkpoint, batch_size=2)
+
+        self.assertIn('resuming after row 3', stdout)
+        self.assertEqual(sorted(Product.objects.values_list('sku', flat=True)), ['A-4', 'A-5'])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_checkpoint_of_another_file(self):
+        path = self.write('feed.csv', 'sku,title,price,description\n')
+        checkpoint = self.write('feed.checkpoint', json.dumps({'source': '/other.csv', 'rows': 3}))
+        with self.assertRaises(CommandError):
+            self.call(path, checkpoint=checkpoint)
+
+    def test_images_are_attached_to_new_products(self):
+        images_dir = os.path.join(self.workdir, 'images')
+        os.mkdir(images_dir)
+        for name in ('a.jpg', 'b.jpg'):
+            with open(os.path.join(images_dir, name), 'wb') as file:
+                file.write(b'\x00' * 1024)
+        path = self.write('feed.csv', 'sku,title,price,description,images\n'
+                                      'A-1,first,1,desc,a.jpg|b.jpg\n'
+                                      'A-2,second,1,desc,../feed.csv\n')
+        stdout, stderr = self.call(path, images_dir=images_dir)
+
+        self.assertIn('row 2: image ../feed.csv not found', stderr)
+        product = Product.objects.get(sku='A-1')
+        self.assertEqual(product.image_count, 2)
+        self.assertEqual(product.images.count(), 2)
+
+        # images of products that already exist are left as they are:
+        self.call(path, images_dir=images_dir)
+        self.assertEqual(product.images.count(), 2)
+
+
+class ProductSkuTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(self.user)))
+
+    def test_products_without_sku_do_not_collide(self):
+        Product.objects.create(sku='', title='p_1', price=1, description='d', owner=self.user)
+        Product.objects.create(title='p_2', price=1, description='d', owner=self.user)
+        self.assertEqual(Product.objects.filter(sku__isnull=True).count(), 2)
+
+    def test_bulk_create_rejects_taken_and_repeated_skus(self):
+        Product.objects.create(sku='A-1', title='p', price=1, description='d', owner=self.user)
+        products = [
+            {'sku': 'A-1', 'title': 'p_1', 'price': '1', 'description': 'd'},
+            {'sku': 'A-2', 'title': 'p_2', 'price': '1', 'description': 'd'},
+            {'sku': 'A-2', 'title': 'p_3', 'price': '1', 'description': 'd'},
+            {'sku': '', 'title': 'p_4', 'price': '1', 'description': 'd'},
+        ]
+        response = self.client.post('/api/v1/products/bulk', {'products': products}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['invalid', 'valid', 'invalid', 'valid'])
+        self.assertIn('sku', response.data['results'][0]['errors'])
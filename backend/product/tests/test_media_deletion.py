@@ -0,0 +1,84 @@
+import io
+import shutil
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from product.management.commands import gc_media
+from product.models import MediaDeletion, Product, ProductImage
+from product.utils import generate_photo_file, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, BACKGROUND_EAGER=True)
+class MediaDeletionTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='test_user', password='user1234')
+        self.product = Product.objects.create(title='product', price=1000, description='desc', owner=self.user)
+        self.images = [
+            ProductImage.objects.create(
+                product=self.product, image=SimpleUploadedFile('photo.png', generate_photo_file().read() + bytes([i]))
+            )
+            for i in range(3)
+        ]
+        self.storage = self.images[0].image.storage
+        self.names = [image.image.name for image in self.images]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def test_cascade_queues_images_and_sweeps_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertNumQueries(3):  # collect the images, delete them, delete the product
+                self.product.delete()
+            self.assertEqual(set(MediaDeletion.objects.values_list('name', flat=True)), set(self.names))
+            self.assertTrue(all(self.storage.exists(name) for name in self.names))
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(any(self.storage.exists(name) for name in self.names))
+        self.assertFalse(MediaDeletion.objects.exists())
+
+    def test_rolled_back_delete_keeps_files(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.product.images.all().delete()
+                transaction.set_rollback(True)
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(ProductImage.objects.count(), 3)
+        self.assertFalse(MediaDeletion.objects.exists())
+        self.assertTrue(all(self.storage.exists(name) for name in self.names))
+
+    def test_gc_deletes_orphaned_files(self):
+        orphan = self.storage.save('product_images/orphan.png', ContentFile(b'orphan'))
+        MediaDeletion.objects.create(name=self.names[0])
+
+        out = io.StringIO()
+        call_command('gc_media', '--dry-run', '--min-age=0', stdout=out)
+        self.assertIn("found 1 orphaned files", out.getvalue())
+        self.assertTrue(self.storage.exists(orphan))
+
+        call_command('gc_media', '--min-age=0', stdout=out)
+        self.assertFalse(self.storage.exists(orphan))
+        # queued but still referenced:
+        self.assertTrue(all(self.storage.exists(name) for name in self.names))
+        self.assertFalse(MediaDeletion.objects.exists())
+
+    def test_gc_keeps_files_referenced_after_the_scan(self):
+        # as if the images were stored again between the scan and the deletion:
+        with mock.patch.object(gc_media.Command, 'referenced_names', return_value=set()):
+            call_command('gc_media', '--min-age=0', stdout=io.StringIO())
+
+        self.assertTrue(all(self.storage.exists(name) for name in self.names))
+        self.assertFalse(MediaDeletion.objects.exists())
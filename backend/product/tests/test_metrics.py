@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from product.models import Product
+
+
+class RequestMetricsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.product = Product.objects.create(title='p_1', price=1000, description='desc of p_1', owner=self.user)
+
+    def server_timing(self, response):
+        return dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/v1/products/')
+
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        self.assertIn('total', timing)
+        self.assertIn('render', timing)
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="\d+ queries"$')
+
+    @override_settings(ROOT_URLCONF='product.tests.urls_asgi')
+    async def test_server_timing_header_asgi(self):
+        # the async views run their queries in sync_to_async threads:
+        response = await self.async_client.get(f'/api/v1/products/{self.product.id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(self.server_timing(response)['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+    def test_auth_stage(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(self.user)))
+        response = self.client.get(f'/api/v1/products/{self.product.id}')
+        self.assertIn('auth', self.server_timing(response))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        response = self.client.get('/api/v1/products/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/v1/products/')
+        self.client.get('/api/v1/products/')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",view="product_list_create"}', body)
+        self.assertIn('http_request_db_queries_bucket{le="0.0",view="product_list_create"}', body)
+        self.assertIn('http_response_size_bytes_count{view="product_list_create"}', body)
+        self.assertIn('product_response_cache_hits_total', body)
+
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+        with override_settings(METRICS_ALLOWED_NETWORKS=['10.0.0.0/8']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 200)
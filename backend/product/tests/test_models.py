@@ -88,3 +88,21 @@ class TestProductImages(TestCase):
         product_image = ProductImage(product=self.product, image=image)
         with self.assertRaises(ValidationError):
             product_image.save()
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA)
+    def test_image_count_is_tracked(self):
+        images = [ProductImage.objects.create(product=self.product, image=create_image(1024)) for _ in range(3)]
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_count, 3)
+
+        images[0].delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_count, 2)
+
+        # saving a product with a stale counter doesn't overwrite it:
+        stale_product = Product.objects.get(id=self.product.id)
+        ProductImage.objects.create(product=self.product, image=create_image(1024))
+        stale_product.title = 'new title'
+        stale_product.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_count, 3)
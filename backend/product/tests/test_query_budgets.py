@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from product.models import Product, ProductImage, MAX_IMG_PER_PRODUCT
+from product.utils import generate_photo_file, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+with open(os.path.join(settings.BASE_DIR, 'benchmarks', 'budgets.json')) as budgets_file:
+    BUDGETS = json.load(budgets_file)
+
+
+# a TransactionTestCase so no test savepoints are counted, the numbers are the ones of the benchmark suite:
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+@mock.patch('product.tasks.run_in_background')
+class QueryBudgetTest(TransactionTestCase):
+    """
+    Query counts of the product endpoints, with products full of images, stay within benchmarks/budgets.json.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='test_user', password='test1234')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(self.user)))
+        self.anonymous = APIClient()
+        products = Product.objects.bulk_create([
+            Product(title=f'p_{i}', price=1000, description=f'desc of p_{i}', owner=self.user,
+                    image_count=MAX_IMG_PER_PRODUCT)
+            for i in range(25)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image='product_images/test.png')
+            for product in products for _ in range(MAX_IMG_PER_PRODUCT)
+        ])
+        self.product = products[0]
+        # the benchmark measures with the token user already cached:
+        self.client.get('/api/v1/products/')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def assertWithinBudget(self, scenario, request, expected_status):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertEqual(response.status_code, expected_status)
+        self.assertLessEqual(
+            len(queries), BUDGETS[scenario]['queries'],
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_list(self, _):
+        self.assertWithinBudget('product_list', lambda: self.anonymous.get('/api/v1/products/'), 200)
+        self.assertWithinBudget('product_list_cached', lambda: self.anonymous.get('/api/v1/products/'), 200)
+
+    def test_list_variants(self, _):
+        for scenario, params in [
+            ('product_list_middle_page', {'page': 2}),
+            ('product_list_cursor', {'pagination': 'cursor'}),
+            ('product_list_filtered', {'min_price': '10', 'ordering': 'price'}),
+            ('product_list_compact', {'fields': 'id,title,price,thumbnail'}),
+            ('product_search', {'q': 'desc'}),
+        ]:
+            self.assertWithinBudget(scenario, lambda: self.anonymous.get('/api/v1/products/', params), 200)
+
+    def test_detail(self, _):
+        self.assertWithinBudget(
+            'product_detail', lambda: self.anonymous.get(f'/api/v1/products/{self.product.id}'), 200
+        )
+
+    def test_create(self, _):
+        self.assertWithinBudget('product_create', lambda: self.client.post('/api/v1/products/', {
+            'title': 'new', 'price': '1000.00', 'description': 'new desc', 'new_images': [generate_photo_file()],
+        }, format='multipart'), 201)
+
+    def test_update(self, _):
+        image_ids = list(self.product.images.order_by('id').values_list('id', flat=True))
+        self.assertWithinBudget('product_update', lambda: self.client.put(f'/api/v1/products/{self.product.id}', {
+            'title': 'updated', 'price': '2000.00', 'description': 'updated desc', 'old_images_ids': image_ids[:-1],
+        }, format='multipart'), 200)
+
+    def test_delete(self, _):
+        self.product.images.order_by('-id').first().delete()
+        self.assertWithinBudget(
+            'product_delete', lambda: self.client.delete(f'/api/v1/products/{self.product.id}'), 204
+        )
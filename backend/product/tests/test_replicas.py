@@ -0,0 +1,89 @@
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import routers
+from product.models import Product
+
+
+# the aliases DB_REPLICAS configures, the test runner turns their routing off for the other tests:
+REPLICAS = [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def route(self, method, user_id=None):
+        token = routers.begin(method)
+        if user_id is not None:
+            routers.user_authenticated(user_id)
+        self.addCleanup(lambda: routers.end(token, 200) if routers._routing.get() else None)
+        return token
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_safe_request_reads_from_replica(self):
+        token = self.route('GET', user_id=1)
+        self.assertEqual(Product.objects.all().db, 'replica_1')
+        self.assertEqual(Product.objects.select_for_update().db, 'default')
+        routers.end(token, 200)
+        self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_unsafe_request_pins_its_user(self):
+        token = self.route('PUT', user_id=1)
+        self.assertEqual(Product.objects.all().db, 'default')
+        routers.end(token, 200)
+
+        self.route('GET', user_id=1)
+        self.assertEqual(Product.objects.all().db, 'default')
+        routers.end(routers.begin('GET'), 200)
+        self.route('GET', user_id=2)
+        self.assertEqual(Product.objects.all().db, 'replica_1')
+
+    def test_failed_write_does_not_pin(self):
+        routers.end(self.route('POST', user_id=1), 400)
+        self.route('GET', user_id=1)
+        self.assertEqual(Product.objects.all().db, 'replica_1')
+
+
+@skipUnless(REPLICAS, "needs DB_REPLICAS, e.g. the primary itself mirrored in tests")
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaReadsTest(TransactionTestCase):
+    """
+    reads routed to a real replica connection, a TransactionTestCase as the replica only sees committed rows.
+    """
+    databases = {'default', *REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.product = Product.objects.create(title='p_1', price=Decimal('10'), description='desc', owner=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(self.user)))
+        self.replica = connections[REPLICAS[0]]
+
+    def test_reads_use_replica_until_user_writes(self):
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            response = self.client.get(f'/api/v1/products/{self.product.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(replica_queries), 0)
+
+        response = self.client.patch(f'/api/v1/products/{self.product.id}', {'title': 'patched'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(self.replica) as replica_queries:
+            response = self.client.get(f'/api/v1/products/{self.product.id}')
+        self.assertEqual(response.data['title'], 'patched')
+        self.assertEqual(len(replica_queries), 0)
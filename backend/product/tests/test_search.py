@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from product.models import Product
+
+
+class ProductSearchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.in_description = Product.objects.create(
+            title='Running shoes', price=Decimal('100'), description='light leather sneakers', owner=self.user
+        )
+        self.in_title = Product.objects.create(
+            title='Leather jacket', price=Decimal('300'), description='warm winter jacket', owner=self.user
+        )
+        Product.objects.create(title='Wool hat', price=Decimal('20'), description='warm winter hat', owner=self.user)
+
+    def test_search_vector_is_kept_current(self):
+        self.assertEqual(list(Product.objects.search('shoe')), [self.in_description])
+
+        self.in_description.title = 'Trail boots'
+        self.in_description.save()
+
+        self.assertFalse(Product.objects.search('shoe').exists())
+        self.assertTrue(Product.objects.search('boot').exists())
+
+    def test_bulk_created_products_are_searchable(self):
+        Product.objects.bulk_create([
+            Product(title='Denim jeans', price=Decimal('50'), description='blue denim', owner=self.user)
+        ])
+        self.assertEqual(Product.objects.search('jeans').count(), 1)
+
+    def test_search_results_are_ranked(self):
+        response = self.client.get('/api/v1/products/?q=leather')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [p['id'] for p in response.data['results']],
+            [self.in_title.id, self.in_description.id]
+        )
+
+    def test_websearch_syntax(self):
+        response = self.client.get('/api/v1/products/', {'q': 'winter -hat'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.in_title.id])
+
+    def test_search_vector_is_not_exposed(self):
+        response = self.client.get(f'/api/v1/products/{self.in_title.id}')
+        self.assertNotIn('search_vector', response.data)
@@ -0,0 +1,74 @@
+import shutil
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from product.models import Product, ProductImage
+from product.utils import create_image, generate_photo_file, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, BACKGROUND_EAGER=True)
+class ImageVariantsTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='test_user', password='user1234')
+        self.product = Product.objects.create(
+            title='Test Product',
+            price=Decimal('99.99'),
+            description='This is a test product',
+            owner=self.user
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        super().tearDownClass()
+
+    def create_product_image(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            product_image = ProductImage.objects.create(product=self.product, image=file)
+        product_image.refresh_from_db()
+        return product_image
+
+    @override_settings(IMAGE_VARIANT_SIZES={'thumbnail': 4})
+    def test_variants_are_generated_after_commit(self):
+        photo = generate_photo_file()
+        product_image = self.create_product_image(SimpleUploadedFile('test.png', photo.read()))
+
+        self.assertIn('thumbnail_webp', product_image.variants)
+        with product_image.image.storage.open(product_image.variants['thumbnail_webp']) as file:
+            with Image.open(file) as thumbnail:
+                self.assertEqual(thumbnail.format, 'WEBP')
+                self.assertLessEqual(max(thumbnail.size), 4)
+
+    def test_invalid_image_is_skipped(self):
+        with self.assertLogs('product.tasks', 'WARNING'):
+            product_image = self.create_product_image(create_image(1024))
+        self.assertEqual(product_image.variants, {})
+
+    def test_variants_are_exposed_by_api(self):
+        photo = generate_photo_file()
+        product_image = self.create_product_image(SimpleUploadedFile('test.png', photo.read()))
+
+        response = self.client.get(f"/api/v1/products/{self.product.id}")
+
+        variants = response.data['images'][0]['variants']
+        self.assertEqual(set(variants), set(product_image.variants))
+        self.assertTrue(all(url.startswith('http://testserver/media/') for url in variants.values()))
+
+    def test_variant_files_are_deleted_with_image(self):
+        photo = generate_photo_file()
+        product_image = self.create_product_image(SimpleUploadedFile('test.png', photo.read()))
+        storage = product_image.image.storage
+        paths = list(product_image.variants.values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product_image.delete()
+
+        self.assertFalse(any(storage.exists(path) for path in paths))
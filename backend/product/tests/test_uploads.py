@@ -0,0 +1,201 @@
+import os
+import shutil
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from product.models import ImageUpload, Product
+from product.utils import generate_photo_file, generate_temp_media
+
+
+TEMP_MEDIA = generate_temp_media()
+TEMP_STAGING = generate_temp_media()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, UPLOAD_STAGING_DIR=TEMP_STAGING, BACKGROUND_EAGER=True)
+class ImageUploadApiViewTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='test_user', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.image = generate_photo_file().read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA)
+        shutil.rmtree(TEMP_STAGING)
+        super().tearDownClass()
+
+    def start_upload(self, size=None):
+        response = self.client.post('/api/v1/products/uploads', {
+            'filename': 'photo.png', 'size': len(self.image) if size is None else size
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['token']
+
+    def send_chunk(self, token, first, last, data=None, size=None):
+        return self.client.generic(
+            'PATCH', f'/api/v1/products/uploads/{token}', self.image[first:last + 1] if data is None else data,
+            content_type='application/offset+octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {first}-{last}/{len(self.image) if size is None else size}'
+        )
+
+    def upload(self):
+        token = self.start_upload()
+        middle = len(self.image) // 2
+        self.assertEqual(self.send_chunk(token, 0, middle - 1).data['offset'], middle)
+        response = self.send_chunk(token, middle, len(self.image) - 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['complete'])
+        return token
+
+    def test_chunked_upload_is_referenced_by_product(self):
+        token = self.upload()
+        self.assertEqual(os.listdir(TEMP_STAGING), [])
+        # out of the publicly served product images until claimed:
+        private_name = ImageUpload.objects.get(token=token).image.name
+        self.assertTrue(private_name.startswith('private/uploads/'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/products/', {
+                'title': 'product', 'price': 1000, 'description': 'desc', 'upload_tokens': [token]
+            }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(os.path.exists(os.path.join(TEMP_MEDIA, private_name)))
+        product = Product.objects.get(id=response.data['id'])
+        self.assertEqual(product.image_count, 1)
+        image = product.images.get().image
+        self.assertTrue(image.name.startswith('product_images/'))
+        with image.open('rb') as file:
+            self.assertEqual(file.read(), self.image)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_upload_is_kept_when_product_is_not_saved(self):
+        token = self.upload()
+        incomplete = self.start_upload()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/products/', {
+                'title': 'product', 'price': 1000, 'description': 'desc', 'upload_tokens': [token, incomplete]
+            }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+        upload = ImageUpload.objects.get(token=token)
+        self.assertTrue(os.path.exists(upload.image.path))
+        # the copy made ahead of the transaction is swept:
+        copy = upload.image.name.replace('private/uploads/', 'product_images/', 1)
+        self.assertFalse(os.path.exists(os.path.join(TEMP_MEDIA, copy)))
+
+    def test_upload_resumes_from_offset(self):
+        token = self.start_upload()
+        self.send_chunk(token, 0, 9)
+
+        response = self.send_chunk(token, 20, len(self.image) - 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 10)
+        self.assertEqual(self.client.get(f'/api/v1/products/uploads/{token}').data['offset'], 10)
+
+        response = self.send_chunk(token, 10, len(self.image) - 1)
+        self.assertTrue(response.data['complete'])
+
+    def test_chunk_written_meanwhile_is_refused(self):
+        token = self.start_upload()
+        # leased to a chunk of the same offset being received:
+        ImageUpload.objects.update(writing_until=timezone.now() + timedelta(seconds=60))
+
+        response = self.send_chunk(token, 0, 9)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertFalse(os.path.exists(os.path.join(TEMP_STAGING, ImageUpload.objects.get().token.hex)))
+
+        # its client stalled past the lease, the next chunk takes over:
+        ImageUpload.objects.update(writing_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.send_chunk(token, 0, 9).data['offset'], 10)
+        self.assertIsNone(ImageUpload.objects.get().writing_until)
+        self.client.delete(f'/api/v1/products/uploads/{token}')
+
+    def test_invalid_chunks(self):
+        token = self.start_upload()
+        self.assertEqual(self.send_chunk(token, 0, 9, size=len(self.image) + 1).status_code, 400)
+        self.assertEqual(self.send_chunk(token, 0, len(self.image)).status_code, 400)
+
+        response = self.send_chunk(token, 0, len(self.image) - 1, data=b'\x00' * len(self.image))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_upload_size_is_limited(self):
+        for data in ({'filename': 'photo.png', 'size': 10 ** 9}, {'filename': 'photo.exe', 'size': 10}):
+            response = self.client.post('/api/v1/products/uploads', data, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_incomplete_or_foreign_upload_is_rejected(self):
+        incomplete = self.start_upload()
+        other = get_user_model().objects.create_user(username='other_user', password='password123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/v1/products/uploads/{incomplete}').status_code, 404)
+        foreign = self.upload()
+        self.client.force_authenticate(self.user)
+
+        for token in (incomplete, foreign):
+            response = self.client.post('/api/v1/products/', {
+                'title': 'product', 'price': 1000, 'description': 'desc', 'upload_tokens': [token]
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('upload_tokens', response.data)
+        self.assertFalse(Product.objects.exists())
+        self.assertEqual(ImageUpload.objects.count(), 2)
+
+    def test_update_adds_uploaded_image(self):
+        product = Product.objects.create(title='product', price=1000, description='desc', owner=self.user)
+        token = self.upload()
+
+        response = self.client.put(f'/api/v1/products/{product.id}', {
+            'title': 'product', 'price': 1000, 'description': 'desc', 'old_images_ids': [], 'upload_tokens': [token]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['images']), 1)
+
+    def test_upload_image_is_served_to_its_owner(self):
+        token = self.upload()
+        path = f'/api/v1/products/uploads/{token}/image'
+
+        response = self.client.get(path, HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.image)
+        self.assertIn('private', response['Cache-Control'])
+
+        with override_settings(MEDIA_ACCEL_REDIRECT_URL='/protected-media/'):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        name = ImageUpload.objects.get(token=token).image.name
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{name}')
+
+        other = get_user_model().objects.create_user(username='other_user', password='password123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(path).status_code, 404)
+        self.client.force_authenticate(self.user)
+        incomplete = self.start_upload()
+        self.assertEqual(self.client.get(f'/api/v1/products/uploads/{incomplete}/image').status_code, 404)
+
+    def test_expired_uploads_are_cleared(self):
+        token = self.upload()
+        self.start_upload()
+        ImageUpload.objects.update(created_at=timezone.now() - timedelta(days=2))
+        stored = ImageUpload.objects.get(token=token).image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('clear_image_uploads', stdout=open(os.devnull, 'w'))
+
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(stored))
+
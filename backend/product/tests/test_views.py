@@ -1,7 +1,12 @@
 import shutil
 
+from django.conf import settings
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
 from rest_framework.test import APIClient
+from asgiref.sync import iscoroutinefunction
 from rest_framework import status
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth import get_user_model
@@ -74,8 +79,29 @@ class ProductListCreateApiViewTest(TestCase):
         self.assertEqual(product.title, data['title'])
         self.assertEqual(product.description, data['description'])
         self.assertEqual(product.images.count(), len(image_files))
+        self.assertTrue(all(img.image.storage.exists(img.image.name) for img in product.images.all()))
         self.assertEqual(product.owner, self.user)
 
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA)
+    def test_product_creation_query_count_does_not_depend_on_image_count(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token))
+        self.client.get('/api/v1/products/')  # cache the token user
+        query_counts = []
+        for count in (1, MAX_IMG_PER_PRODUCT):
+            data = {
+                'title': "test product creation",
+                'price': 120000,
+                'description': "Desc for test product creation",
+                'new_images': [generate_photo_file() for _ in range(count)]
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/v1/products/', data, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(Product.objects.get(id=response.data['id']).image_count, count)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
     @override_settings(MEDIA_ROOT=TEMP_MEDIA)
     def test_invalid_product_creation_by_invalid_image_count(self):
         image_files = []
@@ -182,3 +208,277 @@ class ProductRUDApiView(TestCase):
         self.assertEqual(product.description, new_data['description'])
         # img_2 should deleted :
         self.assertEqual(product.images.count(), 1)
+        self.assertEqual(product.image_count, 1)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_2)
+    def test_update_product_rejects_images_over_quota(self):
+        product = Product.objects.create(
+            title='p_1',
+            price=Decimal('8000'),
+            description='desc of p_1',
+            owner=self.user
+        )
+        old_images = [
+            ProductImage.objects.create(image=create_image(1024), product=product) for _ in range(MAX_IMG_PER_PRODUCT)
+        ]
+        new_data = {
+            'title': 'new p_1',
+            'price': product.price,
+            'description': 'new description of p_1',
+            'old_images_ids': [img.id for img in old_images],
+            'new_images': [generate_photo_file()]
+        }
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token))
+        response = self.client.put(f"/api/v1/products/{product.id}", data=new_data, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Product.objects.get(id=product.id).image_count, MAX_IMG_PER_PRODUCT)
+
+
+    def reconcile_images(self, method, removed, added, **data):
+        """
+        Send a PUT/PATCH removing the last `removed` images of a product and adding `added` new ones,
+        returns the response and the queries it ran.
+        """
+        product = Product.objects.create(title='p_1', price=Decimal('8000'), description='desc', owner=self.user)
+        images = [ProductImage.objects.create(image=create_image(1024), product=product) for _ in range(removed + 1)]
+        data.update({
+            'old_images_ids': [images[0].id],
+            'new_images': [generate_photo_file() for _ in range(added)],
+        })
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token))
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(f"/api/v1/products/{product.id}", data=data, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        product.refresh_from_db()
+        self.assertEqual(product.image_count, 1 + added)
+        self.assertEqual(product.images.count(), 1 + added)
+        return response, queries
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_2)
+    def test_put_query_count_does_not_depend_on_image_count(self):
+        self.client.get('/api/v1/products/', HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token))
+        data = {'title': 'new p_1', 'price': '9000', 'description': 'desc'}
+        _, few = self.reconcile_images('put', removed=1, added=1, **data)
+        most = MAX_IMG_PER_PRODUCT - 1
+        response, many = self.reconcile_images('put', removed=most, added=most, **data)
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(response.data['title'], 'new p_1')
+        statements = [query['sql'].split()[0] for query in many]
+        self.assertEqual(statements.count('DELETE'), 1)
+        self.assertEqual(statements.count('INSERT'), 1)
+        self.assertEqual(statements.count('UPDATE'), 1)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_2)
+    def test_patch_query_count_does_not_depend_on_image_count(self):
+        self.client.get('/api/v1/products/', HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token))
+        _, few = self.reconcile_images('patch', removed=1, added=0)
+        _, many = self.reconcile_images('patch', removed=MAX_IMG_PER_PRODUCT - 1, added=0)
+        self.assertEqual(len(few), len(many))
+
+        # only image_count and updated_at are written when only the images change:
+        update = next(query['sql'] for query in many if query['sql'].startswith('UPDATE'))
+        self.assertNotIn('"title"', update)
+        self.assertIn('"image_count"', update)
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_2)
+    def test_patch_without_old_images_keeps_images(self):
+        ProductImage.objects.create(image=create_image(1024), product=self.product)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(self.access_token))
+
+        response = self.client.patch(f"/api/v1/products/{self.product.id}", data={'title': 'patched'})
+
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.title, 'patched')
+        self.assertEqual(self.product.image_count, 1)
+
+
+class ProductListPaginationTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.products = [
+            Product.objects.create(title=f'p_{i}', price=Decimal('1000'), description=f'desc of p_{i}', owner=self.user)
+            for i in range(25)
+        ]
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get('/api/v1/products/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_cursor_mode_walks_all_products_without_count(self):
+        seen_ids = []
+        path = '/api/v1/products/?pagination=cursor'
+        while path:
+            with self.assertNumQueries(2):  # products page + images prefetch, no COUNT(*)
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen_ids += [p['id'] for p in response.data['results']]
+            path = response.data['next']
+
+        self.assertEqual(seen_ids, sorted((p.id for p in self.products), reverse=True))
+
+    def test_approximate_count(self):
+        response = self.client.get('/api/v1/products/?pagination=cursor&count=approx')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('count', response.data)
+        self.assertGreaterEqual(response.data['count'], 0)
+
+        response = self.client.get('/api/v1/products/?count=approx')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.data['count'], 0)
+
+
+class ProductListFieldsTest(TestCase):
+    TEMP_MEDIA = generate_temp_media()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.products = [
+            Product.objects.create(title=f'p_{i}', price=Decimal('1000'), description=f'desc of p_{i}', owner=self.user)
+            for i in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.TEMP_MEDIA)
+        super().tearDownClass()
+
+    def test_sparse_fields_skip_columns_and_images(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/products/?fields=title,price')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0], {'title': 'p_2', 'price': '1000.00'})
+        self.assertEqual(len(queries), 2)  # count + page, no images prefetch
+        self.assertNotIn('"description"', queries[-1]['sql'])
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA)
+    def test_compact_list_has_thumbnail(self):
+        image = ProductImage.objects.create(product=self.products[0], image=create_image(1024))
+        ProductImage.objects.filter(id=image.id).update(variants={'thumbnail_webp': 'product_images/variants/t.webp'})
+
+        results = self.client.get('/api/v1/products/?fields=').data['results']
+
+        self.assertEqual(set(results[0]), {'id', 'title', 'price', 'thumbnail'})
+        self.assertIsNone(results[0]['thumbnail'])
+        self.assertTrue(results[-1]['thumbnail'].endswith('/media/product_images/variants/t.webp'))
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA)
+    def test_expand_images(self):
+        ProductImage.objects.create(product=self.products[0], image=create_image(1024))
+
+        results = self.client.get('/api/v1/products/?fields=id&expand=images').data['results']
+
+        self.assertEqual(set(results[-1]), {'id', 'images'})
+        self.assertEqual(len(results[-1]['images']), 1)
+
+    def test_cursor_pagination_and_ordering(self):
+        response = self.client.get('/api/v1/products/?fields=id&pagination=cursor&ordering=price&page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+
+    def test_unknown_fields(self):
+        response = self.client.get('/api/v1/products/?fields=title,secret&expand=owner')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+        self.assertIn('expand', response.data)
+
+
+class ProductBulkCreateApiViewTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(username='test_user', password='test1234')
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(self.user)))
+
+    def test_bulk_create(self):
+        products = [
+            {'title': f'p_{i}', 'price': '1000.00', 'description': f'desc of p_{i}'}
+            for i in range(30)
+        ]
+        with self.assertNumQueries(4):  # user + savepoint, insert, release savepoint
+            response = self.client.post('/api/v1/products/bulk', {'products': products}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data['results']
+        self.assertEqual([r['index'] for r in results], list(range(30)))
+        self.assertTrue(all(r['status'] == 'created' for r in results))
+        self.assertEqual(Product.objects.filter(owner=self.user).count(), 30)
+        self.assertEqual(Product.objects.get(id=results[3]['id']).title, 'p_3')
+
+    def test_invalid_item_rejects_whole_batch(self):
+        products = [
+            {'title': 'p_1', 'price': '1000.00', 'description': 'desc of p_1'},
+            {'title': '', 'price': '1000.00', 'description': 'desc of p_2'},
+        ]
+        response = self.client.post('/api/v1/products/bulk', {'products': products}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        results = response.data['results']
+        self.assertEqual(results[0]['status'], 'valid')
+        self.assertEqual(results[1]['status'], 'invalid')
+        self.assertIn('title', results[1]['errors'])
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(BULK_CREATE_MAX_ITEMS=2)
+    def test_max_items(self):
+        products = [{'title': 'p', 'price': '1', 'description': 'd'}] * 3
+        response = self.client.post('/api/v1/products/bulk', {'products': products}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unauthorized(self):
+        self.client.credentials()
+        response = self.client.post('/api/v1/products/bulk', {'products': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(ROOT_URLCONF='product.tests.urls_asgi')
+class ProductAsyncReadTest(TestCase):
+    """
+    the product reads are async views under ASGI, served here through the ASGI request handler.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='test_user', password='password123')
+        self.products = Product.objects.bulk_create([
+            Product(title=f'product {i}', price=1000, description='desc', owner=self.user) for i in range(25)
+        ])
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_list(self):
+        response = await self.async_client.get('/api/v1/products/?page=2', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 25)
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertIn('render', response['Server-Timing'])
+
+    async def test_cursor_list(self):
+        response = await self.async_client.get('/api/v1/products/?cursor=', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 20)
+
+    async def test_detail(self):
+        product = self.products[0]
+        response = await self.async_client.get(f'/api/v1/products/{product.pk}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], product.title)
+
+        response = await self.async_client.get('/api/v1/products/0', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ROOT_URLCONF='core.urls')
+    def test_views_follow_server_mode(self):
+        # under WSGI no event loop per request, the sync handlers run in the worker:
+        for path in ('/api/v1/products/', f'/api/v1/products/{self.products[0].pk}'):
+            self.assertEqual(iscoroutinefunction(resolve(path).func), settings.SERVER_MODE == 'asgi')
+            self.assertEqual(self.client.get(path, headers=self.headers).status_code, 200)
@@ -0,0 +1,17 @@
+"""
+Product read urls served by their async handlers, as with SERVER_MODE=asgi.
+"""
+from django.urls import path
+
+from product.api.views import ProductListCreateApiView, ProductRetrieveUpdateDestroyApiView
+
+
+urlpatterns = [
+    path(
+        'api/v1/products/', ProductListCreateApiView.as_view(view_is_async=True), name='product_list_create'
+    ),
+    path(
+        'api/v1/products/<int:pk>', ProductRetrieveUpdateDestroyApiView.as_view(view_is_async=True),
+        name='product_detail'
+    ),
+]
@@ -0,0 +1,182 @@
+import contextlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from core.metrics import timed
+from .fields import lock_files
+from .models import ImageUpload, MediaDeletion, ProductImage
+from .tasks import schedule_media_sweep
+
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class InvalidChunk(UploadError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    """
+    The chunk doesn't start where the upload stands, the client resumes from `offset`.
+    """
+
+    def __init__(self, offset):
+        super().__init__(f"upload continues at byte {offset}")
+        self.offset = offset
+
+
+def parse_content_range(header, size):
+    """
+    Parse `bytes <first>-<last>/<total>`, returns `(first, last)` of a chunk within an upload of `size` bytes.
+    """
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise InvalidChunk("Content-Range header `bytes <first>-<last>/<total>` is required")
+    first, last, total = map(int, match.groups())
+    if total != size:
+        raise InvalidChunk(f"upload size is {size} bytes, not {total}")
+    if first > last or last >= size:
+        raise InvalidChunk("Content-Range is out of the upload bounds")
+    return first, last
+
+
+def staging_path(upload):
+    return os.path.join(settings.UPLOAD_STAGING_DIR, upload.token.hex)
+
+
+def write_chunk(upload, first, last, stream):
+    """
+    Copy the request body to the staging file at `first`, outside of any transaction.
+    the upload is leased to this chunk by a single UPDATE, a concurrent chunk is refused instead of writing over it.
+    bytes received before the client went away are kept, the next chunk resumes after them.
+    returns the new offset of the upload.
+    """
+    lease = timezone.now() + timedelta(seconds=settings.UPLOAD_CHUNK_LEASE)
+    leased = ImageUpload.objects.filter(id=upload.id, received=first).filter(
+        Q(writing_until__isnull=True) | Q(writing_until__lt=timezone.now())
+    ).update(writing_until=lease)
+    if not leased:  # another offset, or a chunk of the same upload is being written
+        upload.refresh_from_db(fields=['received'])
+        raise OffsetMismatch(upload.received)
+
+    path = staging_path(upload)
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    written = 0
+    try:
+        with timed('storage'), open(path, 'r+b' if os.path.exists(path) else 'wb') as file:
+            file.seek(first)
+            remaining = last - first + 1
+            try:
+                while remaining:
+                    data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+                    if not data:
+                        break
+                    file.write(data)
+                    written += len(data)
+                    remaining -= len(data)
+            except OSError:  # client disconnected mid chunk
+                pass
+            file.truncate(first + written)
+    finally:
+        # compare-and-set, a chunk which outlived its lease was taken over and doesn't advance the upload:
+        advanced = ImageUpload.objects.filter(id=upload.id, received=first, writing_until=lease).update(
+            received=first + written, writing_until=None
+        )
+    if not advanced:
+        upload.refresh_from_db(fields=['received'])
+        raise OffsetMismatch(upload.received)
+    upload.received = first + written
+    return upload.received
+
+
+def complete_upload(upload):
+    """
+    Check the staged file is an image and move it to the media storage, the upload is deleted otherwise.
+    """
+    path = staging_path(upload)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        discard_upload(upload)
+        raise InvalidChunk("upload is not a valid image")
+
+    # the file stays locked against the sweeper until the upload references it:
+    with transaction.atomic(), open(path, 'rb') as file:
+        upload.image.save(upload.filename, File(file), save=False)
+        ImageUpload.objects.filter(id=upload.id).update(image=upload.image.name)
+    os.remove(path)
+
+
+def discard_upload(upload):
+    """
+    Delete an upload with its staged file, the stored image is queued for deletion.
+    """
+    if os.path.exists(staging_path(upload)):
+        os.remove(staging_path(upload))
+    with transaction.atomic():
+        upload.delete()
+        if upload.image:
+            MediaDeletion.objects.create(name=upload.image.name)
+            schedule_media_sweep()
+
+
+def publish_uploads(owner, tokens):
+    """
+    Copy the completed uploads of `owner` to the product storage, ahead of the transaction claiming them.
+    returns `(private name, product storage name)` keyed by token, the uploads are left as they are.
+    """
+    uploads = list(ImageUpload.objects.filter(
+        owner=owner, token__in=tokens
+    ).exclude(image='').values_list('token', 'image'))
+    if not uploads:
+        return {}
+    storage = ImageUpload._meta.get_field('image').storage
+    with contextlib.ExitStack() as stack:
+        files = [(name, stack.enter_context(storage.open(name))) for _, name in uploads]
+        names = ProductImage._meta.get_field('image').store_files(files)
+    return {token: (private, name) for (token, private), name in zip(uploads, names)}
+
+
+def claim_uploads(owner, published):
+    """
+    Take the uploads copied by publish_uploads out of the upload table, returns the names of their images in the
+    product storage keyed by token. runs in the transaction saving the product, so an upload is used by one product
+    only. the copies are locked against the sweeper until the product references them, the private files are
+    deleted after commit.
+    """
+    uploads = list(ImageUpload.objects.select_for_update().filter(
+        owner=owner, token__in=list(published)
+    ).exclude(image='').values_list('id', 'token', 'image'))
+    if not uploads:
+        return {}
+    ImageUpload.objects.filter(id__in=[upload_id for upload_id, _, _ in uploads]).delete()
+
+    field = ProductImage._meta.get_field('image')
+    lock_files([published[token][1] for _, token, _ in uploads])
+    for _, token, private in uploads:
+        name = published[token][1]
+        # a copy shared with an image deleted meanwhile may have been swept already:
+        if not field.storage.exists(name):
+            with ImageUpload._meta.get_field('image').storage.open(private) as file:
+                field.storage.save(name, file, max_length=field.max_length)
+    MediaDeletion.objects.bulk_create([MediaDeletion(name=private) for _, _, private in uploads])
+    schedule_media_sweep()
+    return {token: published[token][1] for _, token, _ in uploads}
+
+
+def expired_uploads():
+    return ImageUpload.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.IMAGE_UPLOAD_EXPIRY))
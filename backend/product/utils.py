@@ -1,3 +1,4 @@
+import hashlib
 import io
 import os
 import uuid
@@ -6,6 +7,7 @@ import tempfile
 from datetime import datetime
 
 from PIL import Image
+from django.core.files import File
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 
@@ -16,6 +18,20 @@ def generate_filename(instance, filename):
     return f"product_images/{timestamp}_{unique_id}_{base}{ext}"
 
 
+def content_hash_filename(filename, content):
+    """
+    `<first 2 hex>/<sha256 hex><ext>` of the file content, identical files get the same name.
+    """
+    if not isinstance(content, File):
+        content = File(content)
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    hex_digest = digest.hexdigest()
+    return f"{hex_digest[:2]}/{hex_digest}{os.path.splitext(filename)[1].lower()}"
+
+
 def create_image(size):
     file = io.BytesIO()
     file.write(b'\x00' * size)